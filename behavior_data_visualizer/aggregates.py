@@ -0,0 +1,91 @@
+# small per day summaries of each mouse, computed when the mouse is loaded
+# and stored on disk, so that comparing many mice over months reads a few
+# hundred rows per mouse instead of all their trials
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from behavior_data_visualizer import disk_cache
+
+# the rolling performance is kept every this many trials
+SAMPLE_EVERY = 50
+
+
+def compute_daily(perf_df):
+    # trials and performance of each day, perf_df as returned by
+    # get_performance_through_trials
+    grouped = perf_df.groupby("year_month_day", observed=True, sort=True)
+    daily = pd.DataFrame({"trials": grouped.size()})
+    if "correct" in perf_df.columns:
+        daily["performance"] = grouped["correct"].mean().astype(float) * 100
+    else:
+        daily["performance"] = np.nan
+    daily["performance_w"] = grouped["performance_w"].last().astype(float)
+    daily["sessions"] = grouped["session"].nunique()
+    daily = daily.reset_index()
+    daily["year_month_day"] = daily["year_month_day"].astype(str)
+    return daily
+
+
+def compute_curve(perf_df):
+    # rolling performance through all the trials, every SAMPLE_EVERY trials
+    samples = perf_df.iloc[SAMPLE_EVERY - 1 :: SAMPLE_EVERY]
+    return pd.DataFrame(
+        {
+            "total_trial": np.arange(len(samples)) * SAMPLE_EVERY
+            + SAMPLE_EVERY,
+            "performance_w": samples["performance_w"].astype(float).to_numpy(),
+            "year_month_day": samples["year_month_day"].astype(str).to_numpy(),
+        }
+    )
+
+
+class AggregateStore:
+    # daily and curve tables of each mouse as csv files, with the stamp of
+    # the data they were computed from
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = disk_cache.get_cache_dir() / "aggregates"
+        self.cache_dir = cache_dir
+
+    def _get_paths(self, project_name, mouse_name):
+        base = self.cache_dir / project_name / mouse_name
+        return (
+            base.with_suffix(".daily.csv"),
+            base.with_suffix(".curve.csv"),
+            base.with_suffix(".json"),
+        )
+
+    def read_stamp(self, project_name, mouse_name):
+        _, _, stamp_path = self._get_paths(project_name, mouse_name)
+        try:
+            with open(stamp_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, project_name, mouse_name):
+        # (daily, curve), or None if they were never computed
+        daily_path, curve_path, _ = self._get_paths(project_name, mouse_name)
+        try:
+            return pd.read_csv(daily_path), pd.read_csv(curve_path)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, project_name, mouse_name, daily, curve, stamp):
+        paths = self._get_paths(project_name, mouse_name)
+        try:
+            paths[0].parent.mkdir(parents=True, exist_ok=True)
+            for table, path in zip([daily, curve], paths[:2]):
+                tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                table.to_csv(tmp_path, index=False)
+                os.replace(tmp_path, path)
+            # the stamp goes last, it marks the tables as complete
+            tmp_path = paths[2].with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(stamp, f)
+            os.replace(tmp_path, paths[2])
+        except OSError as e:
+            print(f"Could not store the aggregates of {mouse_name}: {e}")
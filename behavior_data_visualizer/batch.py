@@ -0,0 +1,203 @@
+# render the progress and session reports of every mouse of every project
+# without the app, e.g. every night from cron:
+#   bdv-reports /archive/reports --max_workers=16
+# a mouse whose csv has not changed is skipped without loading it, and only
+# the sessions whose trials changed are rendered again
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import fire
+import pandas as pd
+
+from behavior_data_visualizer import disk_cache, reports, utils
+from behavior_data_visualizer.day_index import get_day_key
+
+MANIFEST_NAME = "manifest.json"
+
+
+def get_manifest_path(output_dir, project_name, mouse_name):
+    return Path(output_dir) / project_name / mouse_name / MANIFEST_NAME
+
+
+def read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def get_day_hash(sdf):
+    # identifies the trials of a session, it only changes if they do
+    values = pd.util.hash_pandas_object(sdf, index=False).to_numpy()
+    return hashlib.md5(values.tobytes()).hexdigest()
+
+
+def get_stale_sessions(day_hashes, manifest, output_dir):
+    # sessions whose trials changed since they were rendered, or whose
+    # report is missing
+    rendered = manifest.get("sessions", {})
+    return [
+        day
+        for day, day_hash in day_hashes.items()
+        if rendered.get(day) != day_hash
+        or not (Path(output_dir) / f"{day}.png").is_file()
+    ]
+
+
+def render_mouse_reports(csv_path, mouse_name, output_dir, manifest, sessions=True):
+    # runs in the worker processes, returns the new manifest, the number of
+    # reports rendered and skipped, and the seconds spent in each stage
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from lecilab_behavior_analysis import figure_maker as fm
+
+    output_dir = Path(output_dir)
+    timings = Counter()
+    rendered = skipped = 0
+
+    start = time.perf_counter()
+    _, loader = utils.load_csv_path(csv_path)
+    timings["load"] += time.perf_counter() - start
+    new_manifest = {"csv": disk_cache.get_csv_stamp(csv_path)}
+
+    def render(make_figure, path):
+        start = time.perf_counter()
+        fig = make_figure()
+        timings["figure"] += time.perf_counter() - start
+        start = time.perf_counter()
+        reports.save_figure(fig, path)
+        timings["save"] += time.perf_counter() - start
+
+    progress_path = output_dir / f"{reports.SUBJECT_PROGRESS}.png"
+    if manifest.get("progress") == loader.stamp and progress_path.is_file():
+        skipped += 1
+    else:
+        render(lambda: fm.subject_progress_figure(loader.df), progress_path)
+        rendered += 1
+    new_manifest["progress"] = loader.stamp
+
+    if sessions:
+        start = time.perf_counter()
+        day_hashes = {}
+        for day in loader.day_index.days:
+            day = get_day_key(day)
+            day_hashes[day] = get_day_hash(loader.day_index.get_day(loader.df, day))
+        sessions_dir = output_dir / "sessions"
+        stale = get_stale_sessions(day_hashes, manifest, sessions_dir)
+        timings["hash"] += time.perf_counter() - start
+        for day in stale:
+            sdf = loader.day_index.get_day(loader.df, day)
+            render(
+                lambda: fm.session_summary_figure(sdf, mouse_name, perf_window=25),
+                sessions_dir / f"{day}.png",
+            )
+        rendered += len(stale)
+        skipped += len(day_hashes) - len(stale)
+        new_manifest["sessions"] = day_hashes
+
+    write_manifest(new_manifest, output_dir / MANIFEST_NAME)
+    return new_manifest, rendered, skipped, timings
+
+
+def count_reports(manifest):
+    return int("progress" in manifest) + len(manifest.get("sessions", {}))
+
+
+def generate_reports(
+    output_dir, projects=None, max_workers=None, sessions=True, executor=None
+):
+    # projects: name or list of names, all of them by default
+    # max_workers: processes rendering, None uses all the cores
+    # executor: runs render_mouse_reports instead of the worker processes
+    output_dir = Path(output_dir)
+    timings = Counter()
+    rendered = skipped = failed = 0
+    wall_start = time.perf_counter()
+
+    start = time.perf_counter()
+    if projects is None:
+        projects = utils.get_list_of_projects()
+    elif isinstance(projects, str):
+        projects = [projects]
+    jobs = []
+    for project_name in projects:
+        for mouse_name in utils.get_list_of_mice(project_name):
+            csv_path = utils.get_mouse_csv_path(project_name, mouse_name)
+            if not csv_path.is_file():
+                continue
+            manifest_path = get_manifest_path(output_dir, project_name, mouse_name)
+            manifest = read_manifest(manifest_path)
+            # the csv has not changed since the last run
+            if manifest.get("csv") == disk_cache.get_csv_stamp(csv_path) and (
+                not sessions or "sessions" in manifest
+            ):
+                skipped += count_reports(manifest)
+                continue
+            jobs.append((csv_path, mouse_name, manifest_path.parent, manifest))
+    timings["check"] += time.perf_counter() - start
+
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    with executor:
+        futures = {
+            executor.submit(render_mouse_reports, *job, sessions=sessions): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            csv_path, mouse_name = futures[future][:2]
+            try:
+                _, n_rendered, n_skipped, job_timings = future.result()
+            except Exception as e:
+                print(f"Could not render the reports of {mouse_name}: {e}")
+                failed += 1
+                continue
+            rendered += n_rendered
+            skipped += n_skipped
+            timings.update(job_timings)
+            print(f"{mouse_name}: {n_rendered} rendered, {n_skipped} up to date")
+
+    wall_time = time.perf_counter() - wall_start
+    print(
+        f"{rendered} reports rendered, {skipped} up to date, "
+        f"{failed} mice failed in {wall_time:.1f} s "
+        f"({rendered / wall_time:.2f} reports/s)"
+    )
+    # seconds summed over the worker processes
+    for stage, seconds in timings.items():
+        print(f"  {stage:8s} {seconds:8.2f} s")
+    return {
+        "rendered": rendered,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": wall_time,
+        "timings": dict(timings),
+    }
+
+
+def run(output_dir, projects=None, max_workers=None, sessions=True, data_path=None):
+    if data_path is not None:
+        utils.set_data_path(data_path)
+    generate_reports(output_dir, projects, max_workers, sessions)
+
+
+def main():
+    fire.Fire(run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# in memory cache of the loaded mice, bounded by the memory of their data
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+def get_loader_size(loader):
+    if loader.df is None:
+        return 0
+    return int(loader.df.memory_usage(deep=True).sum())
+
+
+class MouseDataCache:
+    # least recently used cache of MouseDataLoader objects keyed by
+    # (project, mouse). Mice are evicted when the memory used by their
+    # dataframes goes over max_bytes
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def get(self, project_name, mouse_name):
+        key = (project_name, mouse_name)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, project_name, mouse_name, loader):
+        key = (project_name, mouse_name)
+        with self._lock:
+            self._entries[key] = loader
+            self._entries.move_to_end(key)
+            self._sizes[key] = get_loader_size(loader)
+            self._evict(keep=key)
+
+    def put_if_fits(self, project_name, mouse_name, loader):
+        # add without evicting other mice, returns whether it was added
+        key = (project_name, mouse_name)
+        size = get_loader_size(loader)
+        with self._lock:
+            if key in self._entries:
+                return True
+            if self.total_bytes + size > self.max_bytes:
+                return False
+            self._entries[key] = loader
+            self._sizes[key] = size
+            return True
+
+    def update_size(self, project_name, mouse_name):
+        # call after refreshing a loader, as its data may have grown
+        key = (project_name, mouse_name)
+        with self._lock:
+            if key in self._entries:
+                self._sizes[key] = get_loader_size(self._entries[key])
+                self._evict(keep=key)
+
+    def _evict(self, keep):
+        # the entry just used is kept even if it is over the budget alone
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        del self._entries[key]
+        del self._sizes[key]
+
+    def invalidate(self, project_name=None, mouse_name=None):
+        # remove a mouse, all the mice of a project or everything
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if project_name is not None and key[0] != project_name:
+                    continue
+                if mouse_name is not None and key[1] != mouse_name:
+                    continue
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
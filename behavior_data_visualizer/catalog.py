@@ -0,0 +1,144 @@
+# in memory catalog of the data root: projects, mice, session csv files
+# and videos. Listing the archive over NFS is slow, so it is scanned once
+# and then refreshed in the background, listing again only the
+# directories whose mtime has changed
+import os
+import threading
+from pathlib import Path
+
+# seconds between background refreshes
+DEFAULT_REFRESH_INTERVAL = 60
+
+
+class DataCatalog:
+    def __init__(self, root):
+        self.root = Path(root)
+        # project -> {"mice": {mouse: (csv size, csv mtime_ns) or None},
+        #             "videos": {mouse: frozenset of file names}}
+        self._projects = {}
+        # path -> (mtime_ns, directory names, file names)
+        self._listings = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # functions called with the (project, mouse) whose csv was removed
+        # or truncated since the previous refresh
+        self._listeners = []
+        self.scans = 0
+
+    def add_listener(self, function):
+        self._listeners.append(function)
+
+    def _list(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return (), ()
+        listing = self._listings.get(path)
+        if listing is not None and listing[0] == mtime:
+            return listing[1], listing[2]
+        dirs, files = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    (dirs if entry.is_dir() else files).append(entry.name)
+        except OSError:
+            return (), ()
+        listing = (mtime, tuple(sorted(dirs)), tuple(sorted(files)))
+        self._listings[path] = listing
+        return listing[1], listing[2]
+
+    def refresh(self):
+        projects = {}
+        for project_name in self._list(self.root)[0]:
+            sessions_path = self.root / project_name / "sessions"
+            mice = {}
+            for mouse_name in self._list(sessions_path)[0]:
+                csv_path = sessions_path / mouse_name / f"{mouse_name}.csv"
+                try:
+                    stat = os.stat(csv_path)
+                    mice[mouse_name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    mice[mouse_name] = None
+            videos_path = self.root / project_name / "videos"
+            videos = {}
+            for mouse_name in self._list(videos_path)[0]:
+                videos[mouse_name] = frozenset(
+                    self._list(videos_path / mouse_name)[1]
+                )
+            projects[project_name] = {"mice": mice, "videos": videos}
+        with self._lock:
+            previous = self._projects
+            self._projects = projects
+            self.scans += 1
+        removed = []
+        for project_name, project in previous.items():
+            mice = projects.get(project_name, {"mice": {}})["mice"]
+            for mouse_name, csv_stat in project["mice"].items():
+                if csv_stat is None:
+                    continue
+                new_stat = mice.get(mouse_name)
+                if new_stat is None or new_stat[0] < csv_stat[0]:
+                    removed.append((project_name, mouse_name))
+        if len(removed) > 0:
+            for function in self._listeners:
+                function(removed)
+
+    def start(self, interval=DEFAULT_REFRESH_INTERVAL):
+        # refresh in a background thread until stop is called
+        if self._thread is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Could not refresh the data catalog: {e}")
+
+        self._thread = threading.Thread(
+            target=run, name="data-catalog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get_projects(self):
+        with self._lock:
+            return sorted(self._projects.keys())
+
+    def get_mice(self, project_name):
+        with self._lock:
+            project = self._projects.get(project_name)
+            if project is None:
+                return []
+            return sorted(project["mice"].keys())
+
+    def get_csv_stat(self, project_name, mouse_name):
+        # (size, mtime_ns) of the session csv, None if there is none
+        with self._lock:
+            project = self._projects.get(project_name)
+            if project is None:
+                return None
+            return project["mice"].get(mouse_name)
+
+    def has_video(self, project_name, mouse_name, file_name):
+        with self._lock:
+            project = self._projects.get(project_name)
+            if project is None:
+                return False
+            return file_name in project["videos"].get(mouse_name, ())
+
+    def video_exists(self, path):
+        # <root>/<project>/videos/<mouse>/<file>, checked in the catalog,
+        # and in the archive if it was recorded after the last refresh
+        try:
+            parts = Path(path).relative_to(self.root).parts
+        except ValueError:
+            return os.path.isfile(path)
+        if len(parts) != 4 or parts[1] != "videos":
+            return os.path.isfile(path)
+        return self.has_video(parts[0], parts[2], parts[3]) or os.path.isfile(
+            path
+        )
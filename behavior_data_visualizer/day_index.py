@@ -0,0 +1,98 @@
+# index of the rows of each day, so that selecting a day in the calendar
+# is a slice of the dataframe instead of a scan of all the trials
+import numpy as np
+import pandas as pd
+
+DAY_COLUMN = "year_month_day"
+
+
+def get_day_key(day):
+    # the calendar gives the day as a string, the dataframe may have it as
+    # a string, a date or a timestamp
+    try:
+        return pd.Timestamp(day).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return str(day)
+
+
+def get_day_values(df):
+    # plain values, so that categorical days compare by value
+    return df[DAY_COLUMN].to_numpy()
+
+
+def is_sorted(days):
+    return pd.Index(days).is_monotonic_increasing
+
+
+def sort_by_day(df):
+    # training village appends the trials in order, so the data is usually
+    # sorted already and this does not copy it
+    days = get_day_values(df)
+    if is_sorted(days):
+        return df
+    order = np.argsort(days, kind="stable")
+    return df.iloc[order].reset_index(drop=True)
+
+
+class DayIndex:
+    # start and stop rows of each day of a dataframe sorted by day
+    def __init__(self, df):
+        self.days = []
+        self.starts = []
+        self.stops = []
+        self._positions = {}
+        self._counts = None
+        self._add_rows(get_day_values(df), 0)
+
+    def _add_rows(self, days, offset):
+        if len(days) == 0:
+            return
+        self._counts = None
+        changes = np.flatnonzero(days[1:] != days[:-1]) + 1
+        starts = np.concatenate([[0], changes])
+        stops = np.concatenate([changes, [len(days)]])
+        for start, stop in zip(starts, stops):
+            day = days[start]
+            key = get_day_key(day)
+            if self.days and key == get_day_key(self.days[-1]):
+                # the day continues from the previous rows
+                self.stops[-1] = offset + stop
+                continue
+            self._positions[key] = len(self.days)
+            self.days.append(day)
+            self.starts.append(offset + start)
+            self.stops.append(offset + stop)
+
+    def can_extend(self, tail):
+        # new rows can be added if they do not go back in time
+        days = get_day_values(tail)
+        if not is_sorted(days):
+            return False
+        return not self.days or len(days) == 0 or days[0] >= self.days[-1]
+
+    def extend(self, tail, offset):
+        self._add_rows(get_day_values(tail), offset)
+
+    def __contains__(self, day):
+        return get_day_key(day) in self._positions
+
+    def get_slice(self, day):
+        position = self._positions.get(get_day_key(day))
+        if position is None:
+            return slice(0, 0)
+        return slice(self.starts[position], self.stops[position])
+
+    def get_day(self, df, day):
+        # positional slice, it does not copy the data
+        return df.iloc[self.get_slice(day)]
+
+    @property
+    def counts(self):
+        # number of trials per day
+        if self._counts is None:
+            self._counts = pd.Series(
+                np.subtract(self.stops, self.starts),
+                index=pd.Index(self.days, name=DAY_COLUMN),
+                name="trial",
+            )
+        return self._counts
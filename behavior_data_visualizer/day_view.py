@@ -0,0 +1,146 @@
+# everything the explorer shows about one day of a mouse: the trials of the
+# day, their rolling performance, where the sessions change and the
+# psychometric table. Each is computed the first time it is needed and
+# shared by all the outputs of a click. The text summary of the day is
+# computed with the other days when the mouse is loaded, see
+# derived.get_day_summaries
+from collections import Counter, OrderedDict
+from functools import cached_property
+
+from behavior_data_visualizer import downsample, metrics
+
+# plotly express and the analysis package are imported when a day is shown,
+# they take most of the startup time of the server
+
+# trials of a day above which the performance is drawn with webgl
+WEBGL_THRESHOLD = 1000
+# and above which it is downsampled to DOWNSAMPLE_POINTS trials
+DOWNSAMPLE_THRESHOLD = 5000
+DOWNSAMPLE_POINTS = 2000
+
+# day views kept per mouse, for going back and forth between a few days
+MAX_VIEWS_PER_MOUSE = 8
+
+# number of times each part of a day view was computed
+stats = Counter()
+
+
+class DayView:
+    def __init__(self, df, date, day_index=None, window=50):
+        self.date = date
+        self.window = window
+        # slice the day from the index if there is one, instead of scanning
+        with metrics.timer("filter"):
+            if day_index is not None:
+                self.df = day_index.get_day(df, date)
+            else:
+                self.df = df[df["year_month_day"] == date]
+        stats["views"] += 1
+
+    @cached_property
+    def performance(self):
+        stats["performance"] += 1
+        from lecilab_behavior_analysis import df_transforms as dft
+
+        with metrics.timer("transform"):
+            return dft.get_performance_through_trials(self.df, window=self.window)
+
+    @cached_property
+    def session_changes(self):
+        # total trial of the first trial of each session after the first
+        perf_df = self.performance
+        changes = perf_df["session"] != perf_df["session"].shift(1)
+        return perf_df.loc[changes, "total_trial"].iloc[1:].tolist()
+
+    @cached_property
+    def psychometric(self):
+        stats["psychometric"] += 1
+        from lecilab_behavior_analysis import df_transforms as dft
+
+        with metrics.timer("transform"):
+            return dft.get_performance_by_difficulty(self.df)
+
+    def get_performance_figure(self):
+        sdf = self.performance
+        with metrics.timer("figure"):
+            return self._build_performance_figure(sdf)
+
+    def _build_performance_figure(self, sdf):
+        import plotly.express as px
+
+        if "stimulus_modality" not in sdf.columns:
+            sdf = sdf.assign(stimulus_modality="unknown")
+        # draw long days with webgl, and only the trials that keep the shape
+        # of the curve for the longest ones. Every point drawn is still a
+        # real trial, so its customdata gives the exact trial of the video
+        n_trials = len(sdf)
+        if n_trials > DOWNSAMPLE_THRESHOLD:
+            keep = downsample.lttb_indices(
+                sdf["total_trial"].to_numpy(),
+                sdf["performance_w"].to_numpy(),
+                DOWNSAMPLE_POINTS,
+            )
+            plot_df = sdf.iloc[keep]
+        else:
+            plot_df = sdf
+        fig = px.scatter(
+            plot_df,
+            x="total_trial",
+            y="performance_w",
+            color="stimulus_modality",
+            render_mode="webgl" if n_trials > WEBGL_THRESHOLD else "svg",
+            hover_data={
+                "total_trial": True,
+                "performance_w": True,
+                "subject": False,
+                "task": False,
+                "date": True,
+                "trial": False,
+            },
+        )
+        # add vertical lines for session changes, all at once as add_vline
+        # validates the whole layout for each line
+        fig.update_layout(
+            shapes=[
+                dict(
+                    type="line",
+                    xref="x",
+                    yref="paper",
+                    y0=0,
+                    y1=1,
+                    x0=total_trial,
+                    x1=total_trial,
+                    line=dict(width=1, dash="dash", color="grey"),
+                )
+                for total_trial in self.session_changes
+            ]
+        )
+        # put legend inside the plot
+        fig.update_layout(
+            legend=dict(
+                orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1
+            )
+        )
+        return fig
+
+    def get_psychometric_figure(self):
+        import plotly.express as px
+
+        pdf = self.psychometric
+        with metrics.timer("figure"):
+            return px.scatter(pdf, x="leftward_evidence", y="leftward_choices")
+
+
+def get_day_view(loader, date, window=50):
+    # the day view of a loaded mouse, shared until its data changes
+    views = loader.get_derived("day_views", lambda df: OrderedDict())
+    key = (date, window)
+    view = views.get(key)
+    if view is None:
+        view = DayView(loader.df, date, loader.day_index, window)
+        views[key] = view
+        if len(views) > MAX_VIEWS_PER_MOUSE:
+            views.popitem(last=False)
+    else:
+        views.move_to_end(key)
+    return view
@@ -0,0 +1,117 @@
+# tables derived from the data of a mouse, computed in a single vectorized
+# pass and kept by the loader until new trials arrive
+import numpy as np
+import pandas as pd
+
+from behavior_data_visualizer.day_index import DAY_COLUMN, get_day_key
+
+# per day metrics the calendar can be coloured by, with their labels
+SUMMARY_METRICS = {
+    "trials": "Trials",
+    "performance": "Performance (%)",
+    "sessions": "Sessions",
+    "minutes": "Minutes of training",
+}
+
+
+def get_trial_offsets(df):
+    # seconds from the first TRIAL_START of its session for every trial,
+    # indexed by (date, trial)
+    first_start = df.groupby("date", observed=True, sort=False)[
+        "TRIAL_START"
+    ].transform("first")
+    offsets = (df["TRIAL_START"] - first_start).to_numpy()
+    index = pd.MultiIndex.from_arrays(
+        [df["date"].astype(str).to_numpy(), df["trial"].to_numpy()],
+        names=["date", "trial"],
+    )
+    return pd.Series(offsets, index=index, name="seconds")
+
+
+def format_day_summary(day, row, modalities):
+    lines = [day]
+    if isinstance(row["task"], str):
+        lines.append(f"Task: {row['task']}")
+    if isinstance(row["stage"], str):
+        lines.append(f"Stage: {row['stage']}")
+    sessions = f"Sessions: {row['sessions']}"
+    if not np.isnan(row["minutes"]):
+        sessions += f", {row['minutes']:.0f} minutes"
+    lines.append(sessions)
+    lines.append(f"Trials: {row['trials']}")
+    if not np.isnan(row["performance"]):
+        lines.append(f"Performance: {row['performance']:.1f}%")
+    for modality, trials, performance in modalities:
+        line = f"  {modality}: {trials} trials"
+        if not np.isnan(performance):
+            line += f", {performance:.1f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def get_day_summaries(df):
+    # everything the text panel and the calendar show about each day, in
+    # grouped passes over all the trials. Indexed by the day as the calendar
+    # gives it, with the day of the data in year_month_day
+    grouped = df.groupby(DAY_COLUMN, observed=True, sort=True)
+    summaries = pd.DataFrame({"trials": grouped.size()})
+    if "correct" in df.columns:
+        summaries["performance"] = grouped["correct"].mean().astype(float) * 100
+    else:
+        summaries["performance"] = np.nan
+    session_column = "session" if "session" in df.columns else "date"
+    summaries["sessions"] = grouped[session_column].nunique()
+    if "TRIAL_START" in df.columns and "TRIAL_END" in df.columns:
+        # first to last trial of each session, added up over the day
+        by_session = df.groupby([DAY_COLUMN, session_column], observed=True)
+        seconds = by_session["TRIAL_END"].max() - by_session["TRIAL_START"].min()
+        summaries["minutes"] = seconds.groupby(level=0, observed=True).sum() / 60
+    else:
+        summaries["minutes"] = np.nan
+    for name, column in [("task", "task"), ("stage", "current_training_stage")]:
+        if column in df.columns:
+            summaries[name] = grouped[column].last().astype(object)
+        else:
+            summaries[name] = None
+    summaries = summaries[summaries["trials"] > 0]
+
+    # trials and performance of each modality
+    modalities = {}
+    if "stimulus_modality" in df.columns:
+        by_modality = df.groupby([DAY_COLUMN, "stimulus_modality"], observed=True)
+        if "correct" in df.columns:
+            counts = by_modality["correct"].agg(["size", "mean"])
+        else:
+            counts = by_modality.size().to_frame("size").assign(mean=np.nan)
+        for (day, modality), trials, mean in zip(
+            counts.index, counts["size"], counts["mean"]
+        ):
+            modalities.setdefault(day, []).append(
+                (modality, trials, float(mean) * 100)
+            )
+
+    # plain values, so that the tables of the appended days concatenate
+    days = np.asarray(summaries.index)
+    summaries.index = pd.Index([get_day_key(day) for day in days], name="day")
+    summaries.insert(0, DAY_COLUMN, days)
+    summaries["text"] = [
+        format_day_summary(key, row, modalities.get(day, []))
+        for key, day, row in zip(summaries.index, days, summaries.to_dict("records"))
+    ]
+    return summaries
+
+
+def update_day_summaries(summaries, df, first_row):
+    # the rows from first_row on were appended in order, so only their days
+    # change: the last day summarised is computed again with the new ones
+    start = first_row
+    first_day = get_day_key(df[DAY_COLUMN].iloc[first_row])
+    if len(summaries) > 0 and summaries.index[-1] == first_day:
+        start -= int(summaries["trials"].iloc[-1])
+    new = get_day_summaries(df.iloc[start:])
+    old = summaries[~summaries.index.isin(new.index)]
+    return pd.concat([old, new])
+
+
+def get_day_text(summaries, day):
+    return summaries["text"].get(get_day_key(day), f"No trials on {day}")
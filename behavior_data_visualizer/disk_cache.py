@@ -0,0 +1,142 @@
+# columnar (feather) copies of the session csv files, so that a mouse
+# is only parsed from csv once per change of the file
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # windows, loads are not coordinated between processes
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional, without it we always read the csv
+    pa = None
+    feather = None
+
+CACHE_DIR_ENV = "BDV_CACHE_DIR"
+# read the cache memory mapped, so that the processes of a multi worker
+# server share the pages of each mouse instead of holding a copy each
+MEMORY_MAP_ENV = "BDV_MEMORY_MAP"
+
+
+def get_cache_dir():
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if cache_dir is None:
+        cache_dir = Path.home() / ".cache" / "behavior_data_visualizer"
+    return Path(cache_dir)
+
+
+def use_memory_map():
+    return os.environ.get(MEMORY_MAP_ENV, "0") == "1"
+
+
+def configure(cache_dir=None, memory_map=None):
+    # set through the environment, so that worker processes inherit it
+    if cache_dir is not None:
+        os.environ[CACHE_DIR_ENV] = str(cache_dir)
+    if memory_map is not None:
+        os.environ[MEMORY_MAP_ENV] = "1" if memory_map else "0"
+
+
+def get_csv_stamp(csv_path):
+    # the cached copy is valid as long as the csv size and mtime do not change
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def get_cache_paths(csv_path, cache_dir=None):
+    # <project>/sessions/<mouse>/<mouse>.csv -> <cache_dir>/<project>/<mouse>
+    csv_path = Path(csv_path)
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    project_name = csv_path.parents[2].name
+    base = Path(cache_dir) / project_name / csv_path.stem
+    return base.with_suffix(".feather"), base.with_suffix(".json")
+
+
+@contextmanager
+def lock(csv_path, cache_dir=None):
+    # exclusive lock on the cached copy of a csv, shared by all processes
+    if fcntl is None:
+        yield
+        return
+    data_path, _ = get_cache_paths(csv_path, cache_dir)
+    try:
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(data_path.with_suffix(".lock"), "w")
+    except OSError:
+        yield
+        return
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_stamp(csv_path, cache_dir=None):
+    _, stamp_path = get_cache_paths(csv_path, cache_dir)
+    try:
+        with open(stamp_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_cached(csv_path, stamp=None, cache_dir=None, memory_map=False):
+    # return the cached dataframe or None if it is missing or out of date
+    if feather is None:
+        return None
+    if stamp is None:
+        stamp = get_csv_stamp(csv_path)
+    if read_stamp(csv_path, cache_dir) != stamp:
+        return None
+    data_path, _ = get_cache_paths(csv_path, cache_dir)
+    try:
+        table = feather.read_table(data_path, memory_map=memory_map)
+    except (OSError, pa.ArrowException):
+        return None
+    # one block per column lets pandas use the mapped memory of the
+    # numeric columns without copying it
+    return table.to_pandas(split_blocks=memory_map)
+
+
+def write_cached(df, csv_path, stamp, cache_dir=None):
+    # stamp has to be taken before reading the csv, so that a file that
+    # changed while being parsed is never marked as valid
+    if feather is None:
+        return False
+    data_path, stamp_path = get_cache_paths(csv_path, cache_dir)
+    try:
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        # write to temporary files and rename, so readers never see
+        # a half written cache
+        tmp_data_path = data_path.with_suffix(f".feather.{os.getpid()}.tmp")
+        # uncompressed so that the file can be memory mapped
+        feather.write_feather(
+            df.reset_index(drop=True),
+            tmp_data_path,
+            compression="uncompressed",
+        )
+        os.replace(tmp_data_path, data_path)
+        tmp_stamp_path = stamp_path.with_suffix(f".json.{os.getpid()}.tmp")
+        with open(tmp_stamp_path, "w") as f:
+            json.dump(stamp, f)
+        os.replace(tmp_stamp_path, stamp_path)
+    except (OSError, pa.ArrowException) as e:
+        print(f"Could not cache {csv_path}: {e}")
+        return False
+    return True
+
+
+def clear_cached(csv_path, cache_dir=None):
+    for path in get_cache_paths(csv_path, cache_dir):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
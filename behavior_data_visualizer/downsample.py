@@ -0,0 +1,42 @@
+# shape preserving downsampling of long traces, so that the browser does
+# not have to draw every trial of long days
+import numpy as np
+
+
+def _mean(values, default):
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return default
+    return values.mean()
+
+
+def lttb_indices(x, y, n_out):
+    # largest triangle three buckets: keep the first and last points and,
+    # for each bucket in between, the point that makes the largest triangle
+    # with the point kept before and the mean of the next bucket.
+    # Returns the positions of the points kept
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        stop = int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, n)
+        avg_x = _mean(x[stop:next_stop], x[-1])
+        avg_y = _mean(y[stop:next_stop], y[-1])
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        # points with missing values are only kept if the bucket has no other
+        area = np.nan_to_num(area, nan=-1.0)
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
@@ -0,0 +1,114 @@
+# loads of the selected mouse that run in a background thread instead of in
+# the callback, so that the callback returns at once and the page polls for
+# their progress. Selecting another mouse cancels the load the page was
+# waiting for, unless another page waits for it too
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from behavior_data_visualizer.loader import LoadCancelled
+
+# seconds after which a page that stopped asking for its load is taken
+# as closed
+CLIENT_TIMEOUT_S = 120
+
+
+class LoadProgress:
+    # passed to MouseDataLoader.load, which calls it between the chunks
+    def __init__(self):
+        self.fraction = 0.0
+        self._cancelled = threading.Event()
+
+    def __call__(self, done, total):
+        if self._cancelled.is_set():
+            raise LoadCancelled
+        if total > 0:
+            self.fraction = done / total
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+class LoadJob:
+    def __init__(self, future, progress):
+        self.future = future
+        self.progress = progress
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class MouseLoadJobs:
+    def __init__(self, load_function, max_workers=1):
+        # function (project_name, mouse_name, progress) -> loader or None
+        self.load_function = load_function
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="load"
+        )
+        # jobs by (project, mouse), until their result is taken
+        self._jobs = {}
+        # client -> (project, mouse) it waits for and when it last asked
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def start(self, project_name, mouse_name, client=None):
+        # the job loading the mouse, started unless it already is. client
+        # identifies the page asking, its previous load is cancelled
+        # unless another page waits for it too
+        key = (project_name, mouse_name)
+        with self._lock:
+            self._clients[client] = (key, time.monotonic())
+            self._cancel_unused()
+            job = self._jobs.get(key)
+            if job is None:
+                progress = LoadProgress()
+                future = self._executor.submit(
+                    self.load_function, project_name, mouse_name, progress
+                )
+                job = LoadJob(future, progress)
+                self._jobs[key] = job
+            return job
+
+    def finish(self, project_name, mouse_name, client=None):
+        # forget a job that is done, its loader is in the cache
+        key = (project_name, mouse_name)
+        with self._lock:
+            if self._clients.get(client, (None,))[0] == key:
+                del self._clients[client]
+            job = self._jobs.get(key)
+            if job is not None and job.done():
+                del self._jobs[key]
+
+    def cancel(self, client=None):
+        # the page does not wait for a load any more
+        with self._lock:
+            self._clients.pop(client, None)
+            self._cancel_unused()
+
+    def _cancel_unused(self):
+        # pages that stopped asking were closed
+        now = time.monotonic()
+        for client, (_, last_seen) in list(self._clients.items()):
+            if now - last_seen > CLIENT_TIMEOUT_S:
+                del self._clients[client]
+        waited = {key for key, _ in self._clients.values()}
+        for key, job in list(self._jobs.items()):
+            if key in waited:
+                continue
+            # queued jobs never start, running ones stop at the next chunk
+            job.future.cancel()
+            job.progress.cancel()
+            del self._jobs[key]
+
+    def shutdown(self):
+        with self._lock:
+            self._clients.clear()
+            self._cancel_unused()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,323 @@
+# incremental loading of the session csv files. Training Village appends
+# trials to the csv of each mouse during the day, so after the first load
+# only the new lines at the end of the file need to be parsed
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from behavior_data_visualizer import disk_cache, schema
+from behavior_data_visualizer.day_index import (
+    DAY_COLUMN,
+    DayIndex,
+    sort_by_day,
+)
+
+# bytes before the parsed offset used to check that a file was only appended
+TAIL_HASH_BYTES = 4096
+# rows parsed at a time when the progress of a load is followed
+CHUNK_ROWS = 50000
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class _BoundedFile(io.RawIOBase):
+    # file object that stops at a given byte, so that pandas never parses
+    # a line that is still being written
+    def __init__(self, f, limit):
+        self.f = f
+        self.limit = limit
+        self.remaining = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self.remaining)
+        if n <= 0:
+            return 0
+        data = self.f.read(n)
+        b[: len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def get_complete_size(csv_path, size):
+    # position right after the last newline before size
+    with open(csv_path, "rb") as f:
+        position = size
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            chunk = f.read(position - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                return start + newline + 1
+            position = start
+    return 0
+
+
+def get_tail_hash(csv_path, offset):
+    with open(csv_path, "rb") as f:
+        start = max(0, offset - TAIL_HASH_BYTES)
+        f.seek(start)
+        return hashlib.md5(f.read(offset - start)).hexdigest()
+
+
+def get_prefix_hash(csv_path, size):
+    # hash of the first size bytes, to check that a file that grew since
+    # it was cached was only appended
+    digest = hashlib.md5()
+    with open(csv_path, "rb") as f:
+        remaining = size
+        while remaining > 0:
+            data = f.read(min(remaining, 1024**2))
+            if not data:
+                break
+            digest.update(data)
+            remaining -= len(data)
+    return digest.hexdigest()
+
+
+class MouseDataLoader:
+    def __init__(
+        self,
+        csv_path,
+        transform=None,
+        use_cache=True,
+        compact=True,
+        memory_map=None,
+    ):
+        self.csv_path = Path(csv_path)
+        # function applied to every parsed chunk, e.g. add_day_column_to_df
+        self.transform = transform
+        self.use_cache = use_cache
+        # parse with the declared dtypes of the training village columns
+        self.compact = compact
+        # keep the data in the memory mapped cache shared between processes
+        if memory_map is None:
+            memory_map = disk_cache.use_memory_map()
+        self.memory_map = use_cache and memory_map
+        self.df = None
+        self.columns = None
+        # bytes and rows of the csv already parsed
+        self.offset = 0
+        self.n_rows = 0
+        self.tail_hash = None
+        # rows of each day, when the data has a day column
+        self.day_index = None
+        # increased every time the data changes
+        self.version = 0
+        # tables computed from the data, by name, with the version they
+        # were computed for
+        self._derived = {}
+        # rows of the data at each version since which only rows were
+        # appended in order, the derived tables of these versions can be
+        # updated with the new rows instead of computed again
+        self._rows_at_version = {}
+        # function (bytes parsed, bytes to parse) of the load in progress,
+        # it raises LoadCancelled to stop it
+        self._progress = None
+        # a cached loader is shared by the callbacks of every page, only
+        # one of them parses its csv at a time
+        self._lock = threading.RLock()
+
+    def get_derived(self, name, function, update=None):
+        # function(df) computed once per version of the data. If trials
+        # were only appended since it was last computed, update(value, df,
+        # first new row) is called instead when given
+        df, version = self.df, self.version
+        entry = self._derived.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        first_row = None if entry is None else self._rows_at_version.get(entry[0])
+        if update is not None and first_row is not None and first_row < len(df):
+            value = update(entry[1], df, first_row)
+        else:
+            value = function(df)
+        self._derived[name] = (version, value)
+        return value
+
+    @property
+    def stamp(self):
+        # identifies the data parsed, the same in every process
+        return f"{self.offset}-{self.tail_hash}"
+
+    def _read(self, start, end, header):
+        with open(self.csv_path, "rb") as f:
+            f.seek(start)
+            bounded = _BoundedFile(f, end - start)
+            reader = io.BufferedReader(bounded)
+            kwargs = schema.get_read_csv_kwargs() if self.compact else {}
+            if not header:
+                kwargs.update(header=None, names=self.columns)
+            if self._progress is None:
+                data = pd.read_csv(reader, sep=";", **kwargs)
+            else:
+                # in chunks, reporting the bytes parsed between them
+                chunks = []
+                with pd.read_csv(
+                    reader, sep=";", chunksize=CHUNK_ROWS, **kwargs
+                ) as chunk_reader:
+                    for chunk in chunk_reader:
+                        chunks.append(chunk)
+                        self._progress(
+                            bounded.limit - bounded.remaining, bounded.limit
+                        )
+                data = schema.concat_chunks(chunks)
+        if self.transform is not None:
+            data = self.transform(data)
+        if self.compact:
+            data = schema.compact_dtypes(data)
+        return data
+
+    def _set(self, df, offset, day_index=None):
+        if day_index is None:
+            # not an append in order of the previous data
+            self._rows_at_version = {}
+            if DAY_COLUMN in df.columns:
+                df = sort_by_day(df)
+                day_index = DayIndex(df)
+        self.df = df
+        self.day_index = day_index
+        self.offset = offset
+        self.n_rows = len(df)
+        self.tail_hash = get_tail_hash(self.csv_path, offset)
+        self.version += 1
+        self._rows_at_version[self.version] = self.n_rows
+
+    def _get_schema_version(self):
+        return schema.SCHEMA_VERSION if self.compact else None
+
+    def _read_header(self):
+        # the names pandas gives the columns of the header, the tail is
+        # parsed with them so that schema.use_column drops the same ones
+        with open(self.csv_path) as f:
+            names = f.readline().rstrip("\r\n").split(";")
+        return [name or f"Unnamed: {i}" for i, name in enumerate(names)]
+
+    def _load_from_cache(self, size, mtime_ns):
+        # the cached copy is valid for a csv with the same size and mtime,
+        # and covers the first part of a csv that has grown since as long
+        # as the bytes before its end did not change
+        stamp = disk_cache.read_stamp(self.csv_path)
+        if stamp is None or "tail_hash" not in stamp or stamp["size"] > size:
+            return False
+        if stamp.get("schema") != self._get_schema_version():
+            return False
+        if get_tail_hash(self.csv_path, stamp["size"]) != stamp["tail_hash"]:
+            return False
+        if stamp["size"] == size:
+            if stamp.get("mtime_ns") != mtime_ns:
+                return False
+        elif stamp.get("prefix_hash") != get_prefix_hash(self.csv_path, stamp["size"]):
+            return False
+        df = disk_cache.read_cached(
+            self.csv_path, stamp, memory_map=self.memory_map
+        )
+        if df is None:
+            return False
+        self.columns = self._read_header()
+        self._set(df, stamp["size"])
+        return True
+
+    def _write_cache(self):
+        stamp = disk_cache.get_csv_stamp(self.csv_path)
+        # only cache data that covers the whole file
+        if stamp["size"] != self.offset:
+            return None
+        stamp["tail_hash"] = self.tail_hash
+        stamp["prefix_hash"] = get_prefix_hash(self.csv_path, self.offset)
+        stamp["schema"] = self._get_schema_version()
+        if not disk_cache.write_cached(self.df, self.csv_path, stamp):
+            return None
+        return stamp
+
+    def _update_cache(self):
+        # write the cached copy unless another process already did
+        stamp = disk_cache.read_stamp(self.csv_path)
+        if stamp is None or (
+            stamp.get("size"),
+            stamp.get("tail_hash"),
+            stamp.get("schema"),
+        ) != (self.offset, self.tail_hash, self._get_schema_version()):
+            stamp = self._write_cache()
+            if stamp is None:
+                return
+        if self.memory_map:
+            # use the mapped copy, so that all the processes share its pages
+            df = disk_cache.read_cached(self.csv_path, stamp, memory_map=True)
+            if df is not None and len(df) == self.n_rows:
+                self.df = df
+
+    def _load(self):
+        stat = os.stat(self.csv_path)
+        size = stat.st_size
+        if self.use_cache and self._load_from_cache(size, stat.st_mtime_ns):
+            # parse whatever was appended after the cache was written
+            if self._append() > 0:
+                self._update_cache()
+            return
+        end = get_complete_size(self.csv_path, size)
+        self.columns = self._read_header()
+        self._set(self._read(0, end, header=True), end)
+        if self.use_cache:
+            self._update_cache()
+
+    def load(self, progress=None):
+        # only one process parses a mouse, the others wait and read the
+        # copy it caches. progress is called between the chunks parsed
+        with self._lock:
+            self._progress = progress
+            try:
+                if self.use_cache:
+                    with disk_cache.lock(self.csv_path):
+                        self._load()
+                else:
+                    self._load()
+            finally:
+                self._progress = None
+            return self.df
+
+    def _append(self):
+        end = get_complete_size(self.csv_path, os.stat(self.csv_path).st_size)
+        if end <= self.offset:
+            return 0
+        tail = self._read(self.offset, end, header=False)
+        df = schema.concat_frames(self.df, tail)
+        day_index = self.day_index
+        if day_index is not None and day_index.can_extend(tail):
+            day_index.extend(tail, len(self.df))
+        else:
+            # the new rows go back in time, sort and index everything again
+            day_index = None
+        self._set(df, end, day_index)
+        return len(tail)
+
+    def refresh(self):
+        # parse the lines appended since the last call, returns their number
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        if self.df is None:
+            self.load()
+            return self.n_rows
+        size = os.stat(self.csv_path).st_size
+        if (
+            size < self.offset
+            or get_tail_hash(self.csv_path, self.offset) != self.tail_hash
+        ):
+            # the file was truncated or rewritten, start again
+            self.load()
+            return self.n_rows
+        n_rows = self._append()
+        if n_rows > 0 and self.memory_map:
+            with disk_cache.lock(self.csv_path):
+                self._update_cache()
+        return n_rows
@@ -1,38 +1,181 @@
 # create a dash app to visualize the behavior data using plotly
+# plotly express, plotly_calplot and the analysis package are imported in
+# the callbacks that use them, so that the server starts quickly
 import dash
-import plotly.express as px
-from plotly_calplot import calplot
 import pandas as pd
 from pathlib import Path
-from lecilab_behavior_analysis import df_transforms as dft
-from lecilab_behavior_analysis import figure_maker as fm
-from lecilab_behavior_analysis import utils as lbaut
-from behavior_data_visualizer import utils
+from behavior_data_visualizer import day_view, derived, disk_cache, jobs, memo, metrics, reports, utils, video
+from behavior_data_visualizer.aggregates import AggregateStore
+from behavior_data_visualizer.cache import MouseDataCache, DEFAULT_MAX_BYTES
+from behavior_data_visualizer.catalog import DataCatalog, DEFAULT_REFRESH_INTERVAL
+from behavior_data_visualizer.prefetch import MousePrefetcher
 import fire
 import os
-from flask import send_from_directory
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dash.exceptions import PreventUpdate
 
-# Serve static files (e.g., videos)
-STATIC_PATH = os.path.join(os.getcwd(), 'static')
-if not os.path.exists(STATIC_PATH):
-    os.makedirs(STATIC_PATH)
+# how often to look for new trials of the selected mouse
+REFRESH_INTERVAL_MS = 30 * 1000
+# directory shared by the worker processes of a server, e.g. under gunicorn:
+# BDV_SHARED_DIR=/dev/shm/bdv gunicorn -w 4 "behavior_data_visualizer.main:create_server()"
+SHARED_DIR_ENV = 'BDV_SHARED_DIR'
+# trials of the rolling performance
+PERFORMANCE_WINDOW = 50
+# how often to look for the reports being rendered
+REPORTS_POLL_MS = 1000
+# how often to update the progress of the mouse being loaded
+LOADING_POLL_MS = 300
+# how often to look for the summaries of the compared mice
+AGGREGATES_POLL_MS = 2000
+# how often to look for the result of a query
+QUERY_POLL_MS = 1000
+# columns the trials can be grouped by in the query tab
+QUERY_GROUP_COLUMNS = ['mouse', 'day', 'stimulus_modality', 'current_training_stage', 'task', 'correct_side']
 
-def app_builder():
+def app_builder(
+    cache_max_bytes=DEFAULT_MAX_BYTES,
+    prefetch_workers=2,
+    figure_cache_max_bytes=memo.DEFAULT_MAX_BYTES,
+    shared_dir=None,
+    catalog_interval=DEFAULT_REFRESH_INTERVAL,
+    report_workers=2,
+    slow_callback_ms=None,
+    data_path=None,
+):
+    if data_path is not None:
+        utils.set_data_path(data_path)
+    # with a shared directory, the worker processes of a server map the same
+    # cached copy of each mouse and share the rendered figures
+    if shared_dir is None:
+        shared_dir = os.environ.get(SHARED_DIR_ENV)
+    if shared_dir is not None:
+        disk_cache.configure(cache_dir=Path(shared_dir) / 'data', memory_map=True)
+
+    # scan the data root once and keep the listings up to date in the background
+    data_path = utils.get_data_path()
+    if data_path is not None:
+        data_catalog = DataCatalog(data_path)
+        data_catalog.refresh()
+        data_catalog.start(interval=catalog_interval)
+        utils.set_catalog(data_catalog)
 
     # get the list of the projects
     projects_list = utils.get_list_of_projects()
 
-    global mouse_data_dict
-    mouse_data_dict = {} # utils.get_mouse_data_dict(project_name)
-    # session_data_dict = {}
+    # loaded mice, evicted when they go over the memory budget
+    global mouse_cache
+    mouse_cache = MouseDataCache(max_bytes=cache_max_bytes)
+    # per day summaries of the mice, updated in the background when they are loaded
+    global aggregate_store
+    aggregate_store = AggregateStore()
+    aggregate_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aggregates")
+
+    def update_aggregates(project_name, mouse_name, loader):
+        try:
+            utils.update_aggregates(project_name, mouse_name, loader, aggregate_store)
+        except Exception as e:
+            print(f"Could not compute the aggregates of {mouse_name}: {e}")
+
+    # last update of the summaries of each loaded mouse, by (project, mouse)
+    aggregate_updates = {}
+
+    def submit_aggregates(project_name, mouse_name, loader):
+        aggregate_updates[(project_name, mouse_name)] = aggregate_executor.submit(
+            update_aggregates, project_name, mouse_name, loader
+        )
+
+    # sweeps computing the summaries of all the mice of a project, by project
+    aggregate_sweeps = {}
+
+    def sweep_aggregates(project_name):
+        # the mice of the project that were never loaded are summarised one
+        # at a time, without being kept in the cache
+        sweep = aggregate_sweeps.get(project_name)
+        if sweep is None or sweep.done():
+            sweep = aggregate_executor.submit(utils.update_project_aggregates, project_name, aggregate_store)
+            aggregate_sweeps[project_name] = sweep
+        return sweep
+
+    def load_mouse(project_name, mouse_name, progress=None):
+        with metrics.timer('load'):
+            loader = utils.get_loaded_mouse(project_name, mouse_name, progress=progress)
+        if loader is not None:
+            # the per day summaries of the text panel and the calendar
+            with metrics.timer('transform'):
+                utils.get_day_summaries(loader)
+            submit_aggregates(project_name, mouse_name, loader)
+        return loader
+
+    # loads the mice of the selected project in the background
+    global mouse_prefetcher
+    mouse_prefetcher = MousePrefetcher(mouse_cache, load_mouse, max_workers=prefetch_workers)
+    # loads the selected mouse without blocking the callbacks
+    global load_jobs
+    # the loads of the pages of different users run side by side
+    load_jobs = jobs.MouseLoadJobs(mouse_prefetcher.get, max_workers=max(1, prefetch_workers))
+    # serialized figures of the days already seen
+    global figure_cache
+    if shared_dir is None:
+        figure_cache = memo.FigureCache(max_bytes=figure_cache_max_bytes)
+    else:
+        figure_cache = memo.DiskFigureCache(Path(shared_dir) / 'figures', max_bytes=figure_cache_max_bytes)
+    # the mice whose csv was removed or rewritten are parsed again if selected
+    if data_path is not None:
+        def forget_mice(keys):
+            for project_name, mouse_name in keys:
+                mouse_cache.invalidate(project_name, mouse_name)
+                figure_cache.invalidate(project_name, mouse_name)
+
+        data_catalog.add_listener(forget_mice)
+    # matplotlib reports, rendered by worker processes into png files
+    global report_renderer
+    report_store = reports.ReportStore()
+    report_renderer = reports.ReportRenderer(report_store, utils.render_report, max_workers=report_workers)
+    # parquet copy of the trials of all the mice, for the queries across mice.
+    # pyarrow.dataset is slow to import, it is created by the first query
+    global trial_dataset
+    trial_dataset = None
+    # the csv files are converted and the queries run in the background,
+    # the query tab polls for the result of its page
+    global query_jobs
+    query_jobs = {}
+    query_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query")
+
+    def run_query(projects, start_date, end_date, group_by):
+        global trial_dataset
+        if trial_dataset is None:
+            from behavior_data_visualizer import query
+            trial_dataset = query.TrialDataset()
+        # convert the mice whose csv changed, then read only the columns
+        # and the days selected
+        n_converted = trial_dataset.update(projects)
+        with metrics.timer('query'):
+            tdf = trial_dataset.aggregate(group_by, 'correct', projects=projects, start=start_date, end=end_date)
+        return tdf, n_converted
 
     app = dash.Dash(__name__)
+    reports.register_report_route(app.server, report_store)
 
-    # Serve static files route
-    @app.server.route('/videos/<path:filename>')
-    def serve_video(filename):
-        return send_from_directory(STATIC_PATH, filename)
+    # timings of the callbacks and their stages, cache counters and memory at /metrics
+    metrics.register_cache_gauges('mouse_cache', mouse_cache)
+    metrics.register_cache_gauges('figure_cache', figure_cache)
+    metrics.registry.register_gauge(
+        'resident_memory_bytes', metrics.get_rss_bytes, help='Resident memory of the server process'
+    )
+    metrics.registry.register_gauge(
+        'day_view_computations_total',
+        lambda: {(('part', part),): count for part, count in day_view.stats.items()},
+        help='Day level computations, by part of the day view',
+        kind='counter',
+    )
+    metrics.register_metrics_route(app.server)
+    # callbacks slower than this are printed
+    timed = metrics.timed_callback(None if slow_callback_ms is None else slow_callback_ms / 1000)
+
+    # Serve the videos from the archive, with support for seeking
+    video_index = video.VideoIndex(utils.get_video_path, exists=utils.video_exists)
+    video.register_video_route(app.server, video_index)
 
     # Clientside callback to set video start time
     app.clientside_callback(
@@ -61,21 +204,15 @@ def app_builder():
     )
 
     # Layout
-    app.layout = dash.html.Div([
+    layout = dash.html.Div([
         dash.dcc.Store(id="video-start-time"),  # Declare globally in layout
         dash.dcc.Store(id="mouse-data-loaded"),
+        # check for trials appended to the csv of the selected mouse
+        dash.dcc.Interval(id="refresh-interval", interval=REFRESH_INTERVAL_MS),
+        # follow the load of the selected mouse
+        dash.dcc.Interval(id="loading-interval", interval=LOADING_POLL_MS, disabled=True),
 
         dash.dcc.Tabs([
-            # dash.dcc.Tab(label='Compare mice', children=[
-            #     dash.dcc.Checklist(
-            #         id='mice-checklist',
-            #         options=[{'label': key, 'value': key} for key in mouse_data_dict.keys()],
-            #         value=[],
-            #         labelStyle={'display': 'block'}
-            #     ),
-            #     dash.dcc.Graph(id='graph')
-            # ]),
-
             dash.dcc.Tab(label='Training Village Behavior Explorer', children=[
                 dash.html.Div([
                     dash.dcc.Dropdown(
@@ -87,12 +224,22 @@ def app_builder():
                     ),
                     dash.dcc.Dropdown(
                         id='single-mouse-dropdown',
-                        options=[{'label': key, 'value': key} for key in mouse_data_dict.keys()],
+                        options=[],
                         value=None,
                         multi=False,
                         style={'width': '10%', 'min-width': '125px', 'flex-shrink': '0'}
                     ),
-                    dash.dcc.Graph(id='reactive-calendar', style={'width': '55%', 'flex-shrink': '0'}),
+                    dash.html.Div([
+                        # what the colour of the days of the calendar shows
+                        dash.dcc.Dropdown(
+                            id='calendar-metric',
+                            options=[{'label': label, 'value': metric} for metric, label in derived.SUMMARY_METRICS.items()],
+                            value='trials',
+                            clearable=False,
+                        ),
+                        dash.html.Div(id='loading-status'),
+                    ], style={'width': '10%', 'flex-shrink': '0'}),
+                    dash.dcc.Graph(id='reactive-calendar', style={'width': '45%', 'flex-shrink': '0'}),
                     dash.html.Pre(id='single-mouse-text', style={'width': '25%', 'flex-shrink': '0'}),
                 ], style={'display': 'flex', 'flex-direction': 'row'}),
                 dash.html.Div([
@@ -101,92 +248,279 @@ def app_builder():
                     dash.html.Pre(id='single-mouse-video', style={'display': 'flex', 'flex-direction': 'row', 'flex': '1', 'width': '45%'}),
                 ], style={'display': 'flex', 'flex-direction': 'row'}),
             ]),
-            # dash.dcc.Tab(label='Reports', children=[
-            #     dash.html.H3('Subject progress'),
-            #     dash.dcc.Dropdown(
-            #         id='reports-mice-dropdown',
-            #         options=[{'label': key, 'value': key} for key in mouse_data_dict.keys()],
-            #         value=None,
-            #         multi=False,
-            #         style={'width': '30%'}
-            #     ),
-            #     dash.html.Img(id='subject-progress', src=''),
-            #     dash.html.H3('Session summary'),
-            #     dash.dcc.Dropdown(
-            #         id='reports-session-dropdown',
-            #         options=[{'label': key, 'value': session_data_dict[key]} for key in session_data_dict.keys()],
-            #         value=None,
-            #         multi=False,
-            #         style={'width': '30%'}
-            #     ),
-            #     dash.html.Img(id='session-summary', src=''),
-            # ]),
+            dash.dcc.Tab(label='Compare mice', children=[
+                dash.html.Div([
+                    dash.dcc.Dropdown(
+                        id='compare-project-dropdown',
+                        options=[{'label': project_name, 'value': project_name} for project_name in projects_list],
+                        value=None,
+                        multi=False,
+                        style={'width': '10%', 'min-width': '125px', 'flex-shrink': '0'}
+                    ),
+                    dash.dcc.RadioItems(
+                        id='compare-metric',
+                        options=[
+                            {'label': 'Performance by day', 'value': 'daily'},
+                            {'label': 'Rolling performance', 'value': 'curve'},
+                        ],
+                        value='daily',
+                        inline=True,
+                    ),
+                ], style={'display': 'flex', 'flex-direction': 'row'}),
+                dash.html.Div([
+                    dash.dcc.Checklist(
+                        id='mice-checklist',
+                        options=[],
+                        value=[],
+                        labelStyle={'display': 'block'},
+                        style={'width': '10%', 'min-width': '125px', 'flex-shrink': '0'}
+                    ),
+                    dash.dcc.Graph(id='graph', style={'flex': '1'}),
+                ], style={'display': 'flex', 'flex-direction': 'row'}),
+                dash.html.Pre(id='compare-status'),
+                dash.dcc.Interval(id='compare-interval', interval=AGGREGATES_POLL_MS, disabled=True),
+            ]),
+            dash.dcc.Tab(label='Reports', children=[
+                dash.dcc.Dropdown(
+                    id='reports-project-dropdown',
+                    options=[{'label': project_name, 'value': project_name} for project_name in projects_list],
+                    value=None,
+                    multi=False,
+                    style={'width': '30%'}
+                ),
+                dash.html.H3('Subject progress'),
+                dash.dcc.Dropdown(
+                    id='reports-mice-dropdown',
+                    options=[],
+                    value=None,
+                    multi=False,
+                    style={'width': '30%'}
+                ),
+                dash.html.Img(id='subject-progress', src=''),
+                dash.html.H3('Session summary'),
+                dash.dcc.Dropdown(
+                    id='reports-session-dropdown',
+                    options=[],
+                    value=None,
+                    multi=False,
+                    style={'width': '30%'}
+                ),
+                dash.html.Img(id='session-summary', src=''),
+                dash.html.Pre(id='reports-status'),
+                # look for the reports being rendered
+                dash.dcc.Interval(id='reports-interval', interval=REPORTS_POLL_MS, disabled=True),
+            ]),
+            dash.dcc.Tab(label='Query trials', children=[
+                dash.html.Div([
+                    dash.dcc.Dropdown(
+                        id='query-projects-dropdown',
+                        options=[{'label': project_name, 'value': project_name} for project_name in projects_list],
+                        value=[],
+                        multi=True,
+                        placeholder='Projects',
+                        style={'width': '30%'}
+                    ),
+                    dash.dcc.DatePickerRange(id='query-dates'),
+                    dash.dcc.Dropdown(
+                        id='query-group-by',
+                        options=[{'label': column, 'value': column} for column in QUERY_GROUP_COLUMNS],
+                        value=['mouse'],
+                        multi=True,
+                        placeholder='Group by',
+                        style={'width': '30%'}
+                    ),
+                    dash.html.Button('Run', id='query-run'),
+                ], style={'display': 'flex', 'flex-direction': 'row'}),
+                dash.html.Pre(id='query-status'),
+                dash.dcc.Interval(id='query-interval', interval=QUERY_POLL_MS, disabled=True),
+                dash.dcc.Graph(id='query-graph'),
+            ]),
         ])
     ])
 
-    # @app.callback(
-    #     dash.dependencies.Output('graph', 'figure'),
-    #     [dash.dependencies.Input('mice-checklist', 'value')],
-    # )
-    # def update_figure(selected_items):
-    #     if len(selected_items) == 0:
-    #         return {}
-    #     tdfs = []
-    #     for key in selected_items:
-    #         df = mouse_data_dict[key]
-    #         df["mouse_name"] = key
-    #         tdfs.append(dft.get_performance_through_trials(df, window=50))
-    #     tdf = pd.concat(tdfs)
-    #     fig = px.line(tdf, x='total_trial', y='performance_w', color='mouse_name')
-    #     return fig
+    def serve_layout():
+        # every page gets its own id, so that the server knows which loads
+        # each page still waits for
+        return dash.html.Div([dash.dcc.Store(id='client-id', data=uuid.uuid4().hex), layout])
+
+    app.layout = serve_layout
+
+    @app.callback(
+        dash.dependencies.Output('mice-checklist', 'options'),
+        dash.dependencies.Output('mice-checklist', 'value'),
+        [dash.dependencies.Input('compare-project-dropdown', 'value')],
+    )
+    @timed
+    def update_checklist_options(selected_project):
+        if selected_project is None:
+            return [], []
+        sweep_aggregates(selected_project)
+        list_of_mice = utils.get_list_of_mice(selected_project)
+        return [{'label': animal, 'value': animal} for animal in list_of_mice], []
+
+    @app.callback(
+        dash.dependencies.Output('graph', 'figure'),
+        dash.dependencies.Output('compare-status', 'children'),
+        dash.dependencies.Output('compare-interval', 'disabled'),
+        [
+            dash.dependencies.Input('mice-checklist', 'value'),
+            dash.dependencies.Input('compare-metric', 'value'),
+            dash.dependencies.Input('compare-interval', 'n_intervals'),
+        ],
+        dash.dependencies.State('compare-project-dropdown', 'value'),
+    )
+    @timed
+    def update_figure(selected_items, metric, n_intervals, project_name):
+        if len(selected_items) == 0 or project_name is None:
+            return {}, '', True
+        # only the stored per day summaries of each mouse are read, the
+        # missing and out of date ones are computed in the background, by
+        # the sweep of the project or after the mouse is loaded
+        tdfs, missing, updating = [], [], False
+        for key in selected_items:
+            tables = utils.get_mouse_aggregates(project_name, key, aggregate_store)
+            if tables is None:
+                missing.append(key)
+                update = aggregate_updates.get((project_name, key))
+                updating = updating or (update is not None and not update.done())
+                continue
+            daily, curve = tables
+            tdf = daily if metric == 'daily' else curve
+            tdfs.append(tdf.assign(mouse_name=key))
+        status, pending = '', False
+        if len(missing) > 0:
+            # selecting the project again sweeps the mice that changed since
+            sweep = aggregate_sweeps.get(project_name)
+            if sweep is None:
+                sweep = sweep_aggregates(project_name)
+            pending = updating or not sweep.done()
+            if pending:
+                status = f"Summarising {', '.join(missing)}..."
+            else:
+                status = f"No summary of {', '.join(missing)}"
+        if len(tdfs) == 0:
+            return {}, status, not pending
+        import plotly.express as px
+        tdf = pd.concat(tdfs)
+        if metric == 'daily':
+            fig = px.line(tdf, x='year_month_day', y='performance', color='mouse_name', markers=True)
+        else:
+            fig = px.line(tdf, x='total_trial', y='performance_w', color='mouse_name')
+        return fig, status, not pending
 
     # create a callback to get the list of the mice when a project is selected
     @app.callback(
         dash.dependencies.Output('single-mouse-dropdown', 'options'),
         [dash.dependencies.Input('projects-dropdown', 'value')],
+        dash.dependencies.State('client-id', 'data'),
     )
-    def update_mice_options(selected_project):
-        # when the project is changed, refresh the mouse_data_dict
-        mouse_data_dict = {}
+    @timed
+    def update_mice_options(selected_project, client_id):
+        # the mice of the other projects may be in use by other pages, they
+        # stay in the cache until the memory budget evicts them, and their
+        # prefetches are theirs to cancel
         if selected_project is None:
+            mouse_prefetcher.cancel(client_id)
             return []
         list_of_mice = utils.get_list_of_mice(selected_project)
+        mouse_prefetcher.prefetch(
+            selected_project, utils.sort_mice_by_activity(selected_project, list_of_mice), client_id
+        )
         return [{'label': animal, 'value': animal} for animal in list_of_mice]
     
-    # create a callback to update the mouse_data_dict when a mouse is selected,
+    def get_mouse_loader(project_name, mouse_name):
+        # from the cache, waiting for the prefetch if it is loading,
+        # or loading it if it was never prefetched or has been evicted
+        return mouse_prefetcher.get(project_name, mouse_name)
+
+    def get_loading_status(mouse_name, fraction):
+        return [
+            dash.html.Progress(value=str(fraction), max='1', style={'width': '100%'}),
+            dash.html.Div(f'Loading {mouse_name}: {fraction:.0%}'),
+        ]
+
+    # create a callback to load the data when a mouse is selected,
+    # and to parse the new trials of the csv while a session is running.
+    # The load runs in the background and the interval follows its progress
     @app.callback(
         dash.dependencies.Output('mouse-data-loaded', 'data'),
+        dash.dependencies.Output('loading-status', 'children'),
+        dash.dependencies.Output('loading-interval', 'disabled'),
         [
             dash.dependencies.Input('projects-dropdown', 'value'),
             dash.dependencies.Input('single-mouse-dropdown', 'value'),
+            dash.dependencies.Input('refresh-interval', 'n_intervals'),
+            dash.dependencies.Input('loading-interval', 'n_intervals'),
         ],
+        dash.dependencies.State('mouse-data-loaded', 'data'),
+        dash.dependencies.State('client-id', 'data'),
     )
-    def update_mouse_data_dict(selected_project, selected_mouse):
+    @timed
+    def update_mouse_data(selected_project, selected_mouse, n_intervals, n_loading_intervals, loaded_data, client_id):
+        # the loads of the other pages are theirs to cancel
         if selected_project is None or selected_mouse is None:
-            return False
-        # check if the data is already loaded
-        if selected_mouse in mouse_data_dict.keys():
-            return True
+            load_jobs.cancel(client_id)
+            return False, [], True
+        loader = mouse_cache.get(selected_project, selected_mouse)
+        if loader is None:
+            job = load_jobs.start(selected_project, selected_mouse, client_id)
+            if not job.done():
+                return dash.no_update, get_loading_status(selected_mouse, job.progress.fraction), False
+            load_jobs.finish(selected_project, selected_mouse, client_id)
+            try:
+                loader = job.result()
+            except Exception as e:
+                return False, f'Could not load {selected_mouse}: {e}', True
+            if loader is None:
+                return False, f'No data found for {selected_mouse}', True
         else:
-            mouse_data_dict[selected_mouse] = utils.load_mouse_data(selected_project, selected_mouse)
-            return True
+            # the load of another mouse is not needed by this page any more
+            load_jobs.cancel(client_id)
+        # parse the trials added since it was loaded
+        if loader.refresh() > 0:
+            mouse_cache.update_size(selected_project, selected_mouse)
+            figure_cache.invalidate(selected_project, selected_mouse)
+            # summarise the days of the new trials
+            with metrics.timer('transform'):
+                utils.get_day_summaries(loader)
+            submit_aggregates(selected_project, selected_mouse, loader)
+        # only trigger the figures when the data has changed. The stamp, not
+        # the version, is the same in every worker process of the server
+        data_loaded = {'mouse': selected_mouse, 'stamp': loader.stamp}
+        if data_loaded == loaded_data:
+            return dash.no_update, [], True
+        return data_loaded, [], True
 
     @app.callback(
         dash.dependencies.Output('reactive-calendar', 'figure'),
+        # only when the data changes, not also when the mouse is selected
         [
-            dash.dependencies.Input('single-mouse-dropdown', 'value'),
             dash.dependencies.Input('mouse-data-loaded', 'data'),
+            dash.dependencies.Input('calendar-metric', 'value'),
         ],
+        dash.dependencies.State('single-mouse-dropdown', 'value'),
+        dash.dependencies.State('projects-dropdown', 'value'),
     )
-    def update_calendar(mouse_name, mouse_data_loaded):
-        if not mouse_data_loaded or mouse_name is None:
+    @timed
+    def update_calendar(mouse_data_loaded, metric, mouse_name, project_name):
+        # wait until the selected mouse is loaded
+        if not mouse_data_loaded or mouse_data_loaded['mouse'] != mouse_name:
+            return {}
+        loader = get_mouse_loader(project_name, mouse_name)
+        if loader is None:
             return {}
-        df = mouse_data_dict[mouse_name]
-        dates_df = df.groupby(["year_month_day"]).count().reset_index()
+        from plotly_calplot import calplot
+        # summarised when the data was loaded
+        summaries = utils.get_day_summaries(loader)
+        if metric not in derived.SUMMARY_METRICS:
+            metric = 'trials'
+        # calplot only takes nanosecond datetimes, the days of the data may
+        # be strings, dates or categories
+        days = pd.to_datetime(summaries.index).astype('datetime64[ns]')
         fig = calplot(
-            dates_df,
+            summaries.fillna({metric: 0}).assign(year_month_day=days),
             x='year_month_day',
-            y='trial',
+            y=metric,
         )
         return fig
 
@@ -196,18 +530,39 @@ def app_builder():
         dash.dependencies.Output('single-mouse-psychometric', 'figure'),
         [
             dash.dependencies.Input('reactive-calendar', 'clickData'),
-            dash.dependencies.Input('single-mouse-dropdown', 'value'),
             dash.dependencies.Input('mouse-data-loaded', 'data'),
         ],
+        dash.dependencies.State('single-mouse-dropdown', 'value'),
+        dash.dependencies.State('projects-dropdown', 'value'),
         prevent_initial_call=True
     )
-    def update_single_mouse_reactive(clickData, mouse_name, mouse_data_loaded):
-        if not mouse_data_loaded or mouse_name is None or clickData is None:
+    @timed
+    def update_single_mouse_reactive(clickData, mouse_data_loaded, mouse_name, project_name):
+        if not mouse_data_loaded or mouse_data_loaded['mouse'] != mouse_name or clickData is None:
             return "", {}, {}
-        text = utils.display_click_data(clickData, mouse_data_dict[mouse_name])
-        perf_fig = utils.update_performance_figure(clickData, mouse_data_dict[mouse_name])
-        psych_fig = utils.update_psychometric_figure(clickData, mouse_data_dict[mouse_name])
-        return text, perf_fig, psych_fig
+        loader = get_mouse_loader(project_name, mouse_name)
+        if loader is None:
+            return "", {}, {}
+        # the outputs of a day only change when new trials are loaded
+        date = utils.get_date_from_click_data(clickData)
+        if date is None:
+            return 'No date selected', {}, {}
+        # summarised when the data was loaded
+        text = derived.get_day_text(utils.get_day_summaries(loader), date)
+        # the text is not cached with the figures any more, a shared cache
+        # may still have the entries with it under the old keys
+        key = (project_name, mouse_name, date, 'figures', PERFORMANCE_WINDOW, loader.stamp)
+        outputs = figure_cache.get(key)
+        if outputs is None:
+            # the day is sliced and its performance computed once for both figures
+            view = day_view.get_day_view(loader, date, PERFORMANCE_WINDOW)
+            perf_fig = view.get_performance_figure()
+            psych_fig = view.get_psychometric_figure()
+            with metrics.timer('serialize'):
+                outputs = (memo.figure_to_json(perf_fig), memo.figure_to_json(psych_fig))
+            figure_cache.put(key, outputs)
+        perf_json, psych_json = outputs
+        return text, memo.json_to_figure(perf_json), memo.json_to_figure(psych_json)
 
     @app.callback(
         dash.dependencies.Output('single-mouse-video', 'children'),
@@ -218,32 +573,32 @@ def app_builder():
         ],
         prevent_initial_call=True
     )
+    @timed
     def update_single_mouse_video(clickData, project_name):
         if clickData is None:
             raise PreventUpdate
 
         try:
             subject, task, date, trial = clickData['points'][0]['customdata']
-            video_path = utils.get_video_path(project_name, subject, task, date, trial)
-        except (KeyError, TypeError):
+        except (KeyError, TypeError, ValueError):
             return dash.html.Div("Invalid click data"), dash.no_update
 
-        if not os.path.exists(video_path):
+        if video_index.get(project_name, subject, task, date) is None:
+            video_path = utils.get_video_path(project_name, subject, task, date, trial)
             return dash.html.Div(f"Video file not found: {video_path}"), dash.no_update
 
-        video_filename = os.path.basename(video_path)
-        static_video_path = os.path.join(STATIC_PATH, video_filename)
-        if not os.path.exists(static_video_path):
-            try:
-                os.symlink(video_path, static_video_path)
-            except OSError as e:
-                return dash.html.Div(f"Error linking video: {e}"), dash.no_update
-
         # convert trial to seconds
-        start_time = utils.get_seconds_of_trial(mouse_data_dict[subject], date, trial)
+        loader = get_mouse_loader(project_name, subject)
+        if loader is None:
+            return dash.html.Div(f"No data found for {subject}"), dash.no_update
+        trial_offsets = loader.get_derived('trial_offsets', derived.get_trial_offsets)
+        try:
+            start_time = utils.get_seconds_of_trial(loader.df, date, trial, trial_offsets)
+        except KeyError as e:
+            return dash.html.Div(e.args[0]), dash.no_update
         video_component = dash.html.Video(
             id="video-player",
-            src=f"/videos/{video_filename}",
+            src=video.get_video_url(project_name, subject, task, date),
             controls=True,
             autoPlay=True,
             muted=True,
@@ -252,43 +607,159 @@ def app_builder():
 
         return video_component, {"time": start_time}
 
-    # @app.callback(
-    #     dash.dependencies.Output('subject-progress', component_property='src'),
-    #     [dash.dependencies.Input('reports-mice-dropdown', 'value')],
-    # )
-    # def update_subject_progress(selected_value):
-    #     if selected_value is None:
-    #         return ''
-    #     df = mouse_data_dict[selected_value]
-    #     fig = fm.subject_progress_figure(df)
-    #     return utils.fig_to_uri(fig)
-
-    # @app.callback(
-    #     dash.dependencies.Output('reports-session-dropdown', 'options'),
-    #     [dash.dependencies.Input('reports-mice-dropdown', 'value')],
-    # )
-    # def update_session_dropdown(selected_value):
-    #     if selected_value is None:
-    #         return []
-    #     df = mouse_data_dict[selected_value]
-    #     session_data_dict = utils.get_diccionary_of_dates(df)
-    #     return [{'label': key, 'value': session_data_dict[key]} for key in session_data_dict.keys()]
-
-    # @app.callback(
-    #     dash.dependencies.Output('session-summary', component_property='src'),
-    #     [dash.dependencies.Input('reports-mice-dropdown', 'value')],
-    #     [dash.dependencies.Input('reports-session-dropdown', 'value')],
-    # )
-    # def update_session_summary(mouse, session):
-    #     if mouse is None or session is None:
-    #         return ''
-    #     df = mouse_data_dict[mouse]
-    #     sdf = df[df["year_month_day"] == session]
-    #     fig = fm.session_summary_figure(sdf, mouse, perf_window=25)
-    #     return utils.fig_to_uri(fig)
+    @app.callback(
+        dash.dependencies.Output('reports-mice-dropdown', 'options'),
+        [dash.dependencies.Input('reports-project-dropdown', 'value')],
+    )
+    @timed
+    def update_reports_mice_options(selected_project):
+        if selected_project is None:
+            return []
+        list_of_mice = utils.get_list_of_mice(selected_project)
+        return [{'label': animal, 'value': animal} for animal in list_of_mice]
+
+    @app.callback(
+        dash.dependencies.Output('reports-session-dropdown', 'options'),
+        [dash.dependencies.Input('reports-mice-dropdown', 'value')],
+        dash.dependencies.State('reports-project-dropdown', 'value'),
+    )
+    @timed
+    def update_session_dropdown(selected_value, project_name):
+        if selected_value is None or project_name is None:
+            return []
+        loader = get_mouse_loader(project_name, selected_value)
+        if loader is None:
+            return []
+        # computed once per version of the data
+        dates_dict = loader.get_derived('dates_dict', utils.get_diccionary_of_dates)
+        return [{'label': key, 'value': key} for key in dates_dict.keys()]
+
+    @app.callback(
+        dash.dependencies.Output('subject-progress', 'src'),
+        dash.dependencies.Output('session-summary', 'src'),
+        dash.dependencies.Output('reports-status', 'children'),
+        dash.dependencies.Output('reports-interval', 'disabled'),
+        [
+            dash.dependencies.Input('reports-mice-dropdown', 'value'),
+            dash.dependencies.Input('reports-session-dropdown', 'value'),
+            dash.dependencies.Input('reports-interval', 'n_intervals'),
+        ],
+        dash.dependencies.State('reports-project-dropdown', 'value'),
+    )
+    @timed
+    def update_reports(mouse, session, n_intervals, project_name):
+        # urls of the rendered reports, or a request to render them; the
+        # interval polls until they are all ready
+        if mouse is None or project_name is None:
+            return '', '', '', True
+        loader = get_mouse_loader(project_name, mouse)
+        if loader is None:
+            return '', '', f'No data found for {mouse}', True
+        csv_path = utils.get_mouse_csv_path(project_name, mouse)
+        requests = [(reports.SUBJECT_PROGRESS, reports.ALL_SESSIONS)]
+        if session is not None:
+            requests.append((reports.SESSION_SUMMARY, session))
+        sources, messages = ['', ''], []
+        for i, (kind, report_session) in enumerate(requests):
+            args = (project_name, mouse, kind, report_session, loader.stamp)
+            url = report_renderer.request(*args, csv_path)
+            if url is not None:
+                sources[i] = url
+                continue
+            error = report_renderer.get_error(*args)
+            if error is None:
+                messages.append(f'Rendering {kind.replace("_", " ")}...')
+            else:
+                messages.append(f'Could not render {kind.replace("_", " ")}: {error}')
+        pending = any(message.startswith('Rendering') for message in messages)
+        return sources[0], sources[1], '\n'.join(messages), not pending
+
+    @app.callback(
+        dash.dependencies.Output('query-graph', 'figure'),
+        dash.dependencies.Output('query-status', 'children'),
+        dash.dependencies.Output('query-interval', 'disabled'),
+        [
+            dash.dependencies.Input('query-run', 'n_clicks'),
+            dash.dependencies.Input('query-interval', 'n_intervals'),
+        ],
+        dash.dependencies.State('query-projects-dropdown', 'value'),
+        dash.dependencies.State('query-dates', 'start_date'),
+        dash.dependencies.State('query-dates', 'end_date'),
+        dash.dependencies.State('query-group-by', 'value'),
+        dash.dependencies.State('client-id', 'data'),
+        prevent_initial_call=True
+    )
+    @timed
+    def update_query(n_clicks, n_intervals, projects, start_date, end_date, group_by, client_id):
+        # a click starts the query of the page, the interval polls until
+        # its result is ready
+        if dash.ctx.triggered_id == 'query-run':
+            if not projects or not group_by:
+                return {}, 'Select at least a project and a column to group by', True
+            # the figure shows the first two columns
+            group_by = group_by[:2]
+            previous = query_jobs.get(client_id)
+            if previous is not None:
+                previous[0].cancel()
+            future = query_executor.submit(run_query, projects, start_date, end_date, group_by)
+            query_jobs[client_id] = (future, group_by)
+            return dash.no_update, 'Updating the dataset...', False
+        job = query_jobs.get(client_id)
+        if job is None:
+            return dash.no_update, dash.no_update, True
+        future, group_by = job
+        if not future.done():
+            return dash.no_update, dash.no_update, False
+        del query_jobs[client_id]
+        try:
+            tdf, n_converted = future.result()
+        except ImportError:
+            return {}, 'The query tab needs pyarrow: pip install behavior-data-visualizer[query]', True
+        except Exception as e:
+            return {}, f'The query failed: {e}', True
+        if len(tdf) == 0:
+            return {}, 'No trials selected', True
+        import plotly.express as px
+        tdf['performance'] = tdf['correct'] * 100
+        color = group_by[1] if len(group_by) > 1 else None
+        if group_by[0] == 'day':
+            fig = px.line(tdf, x='day', y='performance', color=color, markers=True, hover_data=['trials'])
+        else:
+            fig = px.bar(tdf, x=group_by[0], y='performance', color=color, barmode='group', hover_data=['trials'])
+        status = f"{int(tdf['trials'].sum())} trials in {len(tdf)} groups"
+        if n_converted > 0:
+            status += f", {n_converted} mice added to the dataset"
+        return fig, status, True
 
     return app
 
+def create_server():
+    # wsgi application for multi process servers, configured from the environment
+    return app_builder().server
+
+def run(
+    port=8050,
+    cache_max_mb=DEFAULT_MAX_BYTES // 1024**2,
+    prefetch_workers=2,
+    figure_cache_max_mb=memo.DEFAULT_MAX_BYTES // 1024**2,
+    shared_dir=None,
+    catalog_interval=DEFAULT_REFRESH_INTERVAL,
+    report_workers=2,
+    slow_callback_ms=None,
+    data_path=None,
+    debug=False,
+):
+    app = app_builder(
+        cache_max_bytes=cache_max_mb * 1024**2,
+        prefetch_workers=prefetch_workers,
+        figure_cache_max_bytes=figure_cache_max_mb * 1024**2,
+        shared_dir=shared_dir,
+        catalog_interval=catalog_interval,
+        report_workers=report_workers,
+        slow_callback_ms=slow_callback_ms,
+        data_path=data_path,
+    )
+    app.run(debug=debug, port=port)
+
 if __name__ == '__main__':
-    app = app_builder()
-    app.run(debug=False, port=8050)
+    fire.Fire(run)
@@ -0,0 +1,193 @@
+# memoization of the outputs of the day callbacks, so that going back to
+# a day already seen does not recompute and rebuild its figures
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import plotly.io as pio
+
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+
+def figure_to_json(fig):
+    if isinstance(fig, dict):
+        return json.dumps(fig)
+    return pio.to_json(fig, validate=False)
+
+
+def json_to_figure(fig_json):
+    # dash takes the figure as a dictionary, no need to build a Figure
+    return json.loads(fig_json)
+
+
+class FigureCache:
+    # least recently used cache of serialized outputs keyed by tuples that
+    # start with (project, mouse), bounded by the size of the strings
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        # value is a string or a tuple of strings
+        strings = (value,) if isinstance(value, str) else value
+        size = sum(len(string) for string in strings)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._total_bytes -= self._sizes.pop(key)
+
+    def invalidate(self, project_name=None, mouse_name=None):
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if project_name is not None and key[0] != project_name:
+                    continue
+                if mouse_name is not None and key[1] != mouse_name:
+                    continue
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DiskFigureCache:
+    # FigureCache stored as files, shared by all the worker processes of
+    # a server. Entries are grouped in a directory per mouse, and the
+    # least recently used files are removed above max_bytes
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_path(self, key):
+        name = hashlib.sha1(repr(key[2:]).encode()).hexdigest()
+        return self.cache_dir / str(key[0]) / str(key[1]) / f"{name}.json"
+
+    def get(self, key):
+        path = self._get_path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+            # the access time is kept in the mtime for the eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value if isinstance(value, str) else tuple(value)
+
+    def put(self, key, value):
+        path = self._get_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not store figure: {e}")
+            return
+        with self._lock:
+            self._puts += 1
+            # walking the directory is slow, check the size every few puts
+            if self._puts % 20 != 0:
+                return
+        self._evict()
+
+    def _list_files(self):
+        files = []
+        for path in self.cache_dir.glob("*/*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    @property
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._list_files())
+
+    def _evict(self):
+        files = sorted(self._list_files())
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            with self._lock:
+                self.evictions += 1
+
+    def invalidate(self, project_name=None, mouse_name=None):
+        if project_name is None:
+            paths = [self.cache_dir]
+        elif mouse_name is None:
+            paths = [self.cache_dir / str(project_name)]
+        else:
+            paths = [self.cache_dir / str(project_name) / str(mouse_name)]
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._list_files()),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,213 @@
+# timings of the callbacks and of the stages of their work (loading,
+# filtering a day, transforming it, building and serializing the figures),
+# with the cache counters, served as prometheus text at /metrics
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response
+
+PREFIX = "bdv"
+# upper bounds in seconds of the histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    def __init__(self):
+        # (name, labels) -> histogram of seconds
+        self._histograms = {}
+        # name -> (help, kind, function read when the metrics are rendered)
+        self._gauges = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, help="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, help)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def register_gauge(self, name, function, help="", kind="gauge"):
+        # function is called when the metrics are read, it returns a number
+        # or a dict {((label, value), ...): number}. kind is counter for
+        # totals kept elsewhere, e.g. the hits of a cache
+        with self._lock:
+            self._gauges[name] = (help, kind, function)
+
+    @contextmanager
+    def timer(self, stage):
+        # time a stage of the work of a callback
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(
+                "stage_seconds",
+                time.perf_counter() - start,
+                help="Seconds spent in each stage",
+                stage=stage,
+            )
+
+    def get_histogram(self, name, **labels):
+        # (count, sum) of a histogram
+        with self._lock:
+            histogram = self._histograms.get((name, tuple(sorted(labels.items()))))
+            if histogram is None:
+                return 0, 0.0
+            return histogram.count, histogram.sum
+
+    def render(self):
+        # prometheus text exposition format
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            gauges = sorted(self._gauges.items())
+            help_texts = dict(self._help)
+
+        def header(name, kind, help):
+            if help:
+                lines.append(f"# HELP {PREFIX}_{name} {help}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        last_name = None
+        for (name, labels), histogram in histograms:
+            if name != last_name:
+                header(name, "histogram", help_texts.get(name))
+                last_name = name
+            labels = dict(labels)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, "le": bound})
+                lines.append(f"{PREFIX}_{name}_bucket{bucket_labels} {cumulative}")
+            inf_labels = _format_labels({**labels, "le": "+Inf"})
+            lines.append(f"{PREFIX}_{name}_bucket{inf_labels} {histogram.count}")
+            lines.append(f"{PREFIX}_{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(
+                f"{PREFIX}_{name}_count{_format_labels(labels)} {histogram.count}"
+            )
+        for name, (help, kind, function) in gauges:
+            try:
+                values = function()
+            except Exception as e:
+                print(f"Could not read the metric {name}: {e}")
+                continue
+            header(name, kind, help)
+            if not isinstance(values, dict):
+                values = {(): values}
+            for labels, value in values.items():
+                if value is None or (isinstance(value, float) and math.isnan(value)):
+                    continue
+                lines.append(f"{PREFIX}_{name}{_format_labels(dict(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# metrics of this process
+registry = Metrics()
+
+
+def timer(stage):
+    return registry.timer(stage)
+
+
+def timed_callback(slow_seconds=None, metrics=None):
+    # decorator recording the duration of a dash callback, and printing the
+    # callbacks slower than slow_seconds
+    if metrics is None:
+        metrics = registry
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                metrics.observe(
+                    "callback_seconds",
+                    seconds,
+                    help="Seconds spent in each dash callback",
+                    callback=function.__name__,
+                )
+                if slow_seconds is not None and seconds > slow_seconds:
+                    print(f"Slow callback {function.__name__}: {seconds:.3f} s")
+
+        return wrapper
+
+    return decorator
+
+
+def get_rss_bytes():
+    # resident memory of this process, None where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def register_cache_gauges(name, cache, metrics=None):
+    # hits, misses, evictions and bytes of a cache with a stats method
+    if metrics is None:
+        metrics = registry
+    for stat, metric_name, kind in [
+        ("hits", "hits_total", "counter"),
+        ("misses", "misses_total", "counter"),
+        ("evictions", "evictions_total", "counter"),
+        ("bytes", "bytes", "gauge"),
+        ("entries", "entries", "gauge"),
+    ]:
+        metrics.register_gauge(
+            f"{name}_{metric_name}",
+            lambda stat=stat: cache.stats()[stat],
+            help=f"{stat.capitalize()} of the {name.replace('_', ' ')}",
+            kind=kind,
+        )
+
+
+def register_metrics_route(server, metrics=None):
+    if metrics is None:
+        metrics = registry
+
+    @server.route("/metrics")
+    def serve_metrics():
+        return Response(
+            metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    return serve_metrics
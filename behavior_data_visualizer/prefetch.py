@@ -0,0 +1,146 @@
+# load the mice of a project in the background, so that selecting a mouse
+# does not have to wait for its csv to be parsed
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+from behavior_data_visualizer.loader import LoadCancelled
+
+# prefetching stops when the cache is this full, to leave room for the
+# mice that are actually selected
+PREFETCH_MEMORY_FRACTION = 0.8
+
+
+class MousePrefetcher:
+    def __init__(
+        self,
+        cache,
+        load_function,
+        max_workers=2,
+        memory_fraction=PREFETCH_MEMORY_FRACTION,
+    ):
+        self.cache = cache
+        # function (project_name, mouse_name) -> loaded MouseDataLoader or None
+        self.load_function = load_function
+        self.memory_fraction = memory_fraction
+        self._executor = None
+        if max_workers > 0:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="prefetch"
+            )
+        # loads in progress, keyed by (project, mouse)
+        self._futures = {}
+        # client -> (project, mouse) of its last prefetch request
+        self._requests = {}
+        # reentrant, cancelling a future runs its callbacks in this thread
+        self._lock = threading.RLock()
+
+    def _has_room(self):
+        max_bytes = self.memory_fraction * self.cache.max_bytes
+        return self.cache.total_bytes < max_bytes
+
+    def _prefetch_one(self, key):
+        if key in self.cache:
+            return None
+        if not self._has_room():
+            return None
+        try:
+            loader = self.load_function(*key)
+        except Exception as e:
+            print(f"Could not prefetch {key}: {e}")
+            return None
+        # prefetched mice never evict the mice that are in use
+        if loader is not None:
+            self.cache.put_if_fits(*key, loader)
+        return loader
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    def prefetch(self, project_name, mice, client=None):
+        # mice are loaded in the order given, so the most recently
+        # active ones should go first. client identifies the page asking,
+        # its previous request is cancelled unless another page asked for
+        # the same mice
+        if self._executor is None:
+            return
+        with self._lock:
+            self._requests[client] = {(project_name, mouse_name) for mouse_name in mice}
+            self._cancel_unrequested()
+            for mouse_name in mice:
+                key = (project_name, mouse_name)
+                if key in self._futures or key in self.cache:
+                    continue
+                future = self._executor.submit(self._prefetch_one, key)
+                self._futures[key] = future
+                future.add_done_callback(
+                    lambda f, key=key: self._forget(key, f)
+                )
+            # forget the pages whose prefetches are all done
+            for other, keys in list(self._requests.items()):
+                if not any(key in self._futures for key in keys):
+                    del self._requests[other]
+
+    def cancel(self, client=None):
+        # the page does not need its prefetches any more
+        with self._lock:
+            self._requests.pop(client, None)
+            self._cancel_unrequested()
+
+    def _cancel_unrequested(self):
+        # cancel the prefetches that have not started yet and that no page
+        # asked for, the loads started by get are running and stay
+        requested = set().union(*self._requests.values())
+        for key, future in list(self._futures.items()):
+            if key not in requested:
+                future.cancel()
+
+    def get(self, project_name, mouse_name, progress=None):
+        # progress is passed to the load function if this call loads it
+        key = (project_name, mouse_name)
+        while True:
+            loader = self.cache.get(project_name, mouse_name)
+            if loader is not None:
+                return loader
+            with self._lock:
+                future = self._futures.get(key)
+                if future is not None and future.cancel():
+                    # still queued behind other prefetches, load it now
+                    future = None
+                owner = future is None or future.done()
+                if owner:
+                    # register the load, so that other callbacks asking for
+                    # the same mouse wait for it instead of parsing it again
+                    future = Future()
+                    future.set_running_or_notify_cancel()
+                    self._futures[key] = future
+            if owner:
+                break
+            try:
+                loader = future.result()
+            except (CancelledError, LoadCancelled):
+                continue
+            if loader is not None:
+                if key not in self.cache:
+                    self.cache.put(project_name, mouse_name, loader)
+                return loader
+            # the prefetch was skipped, try again
+        try:
+            if progress is None:
+                loader = self.load_function(project_name, mouse_name)
+            else:
+                loader = self.load_function(project_name, mouse_name, progress)
+            if loader is not None:
+                self.cache.put(project_name, mouse_name, loader)
+            future.set_result(loader)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._forget(key, future)
+        return loader
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
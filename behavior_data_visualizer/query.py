@@ -0,0 +1,272 @@
+# query the trials of every mouse of every project without loading them in
+# pandas. The session csv files are converted to a parquet dataset,
+# partitioned by project and mouse and sorted by day, so that the filters
+# on project, mouse and day skip whole files and row groups, and only the
+# columns asked for are read:
+#   dataset = TrialDataset()
+#   dataset.update()
+#   dataset.aggregate(["mouse", "stimulus_modality"], projects=["project"],
+#                     start="2024-05-01", end="2024-05-31")
+import datetime
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from behavior_data_visualizer import disk_cache, utils
+from behavior_data_visualizer.loader import MouseDataLoader
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, pip install behavior-data-visualizer[query]
+    pa = None
+
+DATA_FILE = "trials.parquet"
+# ignored by the dataset, as it starts with an underscore
+STAMP_FILE = "_stamp.json"
+DAY_COLUMN = "day"
+# small enough for the day filters to skip most of a long history
+ROW_GROUP_SIZE = 20000
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "The trial dataset needs pyarrow: pip install behavior-data-visualizer[query]"
+        )
+
+
+def to_date(value):
+    if value is None or isinstance(value, datetime.date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def to_table(df):
+    # plain types, so that the files of all the mice share a schema: the
+    # categoricals and objects become strings, the numbers 64 bit
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series.dtype):
+            columns[column] = pa.array(series.to_numpy(), type=pa.bool_())
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            columns[column] = pa.array(series.to_numpy(dtype=np.int64))
+        elif pd.api.types.is_float_dtype(series.dtype):
+            columns[column] = pa.array(series.to_numpy(dtype=np.float64))
+        else:
+            values = series.astype(str).where(series.notna(), None)
+            columns[column] = pa.array(values.to_numpy(dtype=object), type=pa.string())
+    # the day of the session, from its start date
+    days = pd.to_datetime(df["date"].astype(str), errors="coerce")
+    columns[DAY_COLUMN] = pa.array(days.to_numpy().astype("datetime64[D]"))
+    return pa.table(columns)
+
+
+def write_mouse_partition(csv_path, partition_dir, stamp, transform, use_cache):
+    # runs in the worker processes of TrialDataset.update
+    loader = MouseDataLoader(csv_path, transform=transform, use_cache=use_cache)
+    loader.load()
+    table = to_table(loader.df)
+    order = pc.sort_indices(table, sort_keys=[(DAY_COLUMN, "ascending")])
+    table = table.take(order)
+    os.makedirs(partition_dir, exist_ok=True)
+    data_path = os.path.join(partition_dir, DATA_FILE)
+    tmp_path = f"{data_path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, data_path)
+    # the stamp goes last, it marks the partition as complete
+    with open(os.path.join(partition_dir, STAMP_FILE), "w") as f:
+        json.dump(stamp, f)
+    return table.num_rows
+
+
+class TrialDataset:
+    def __init__(self, dataset_dir=None, transform=utils.add_day_column, use_cache=True):
+        require_pyarrow()
+        if dataset_dir is None:
+            dataset_dir = disk_cache.get_cache_dir() / "dataset"
+        self.dataset_dir = Path(dataset_dir)
+        # the mice are loaded as the app loads them, so that they share the
+        # cached copies; a different transform must not use the cache
+        self.transform = transform
+        self.use_cache = use_cache
+        self._dataset = None
+        self._lock = threading.Lock()
+
+    def get_partition_dir(self, project_name, mouse_name):
+        return self.dataset_dir / f"project={project_name}" / f"mouse={mouse_name}"
+
+    def _read_stamp(self, partition_dir):
+        try:
+            with open(partition_dir / STAMP_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_stale_mice(self, projects=None):
+        # (project, mouse, csv path, stamp) of the mice whose csv changed
+        if projects is None:
+            projects = utils.get_list_of_projects()
+        stale = []
+        for project_name in projects:
+            for mouse_name in utils.get_list_of_mice(project_name):
+                csv_path = utils.get_mouse_csv_path(project_name, mouse_name)
+                try:
+                    stamp = disk_cache.get_csv_stamp(csv_path)
+                except OSError:
+                    continue
+                partition_dir = self.get_partition_dir(project_name, mouse_name)
+                if self._read_stamp(partition_dir) != stamp:
+                    stale.append((project_name, mouse_name, csv_path, stamp))
+        return stale
+
+    def update(self, projects=None, max_workers=1):
+        # convert the csv files that changed since the last update, returns
+        # the number of mice converted
+        stale = self.get_stale_mice(projects)
+        jobs = [
+            (
+                str(csv_path),
+                str(self.get_partition_dir(project_name, mouse_name)),
+                stamp,
+                self.transform,
+                self.use_cache,
+            )
+            for project_name, mouse_name, csv_path, stamp in stale
+        ]
+        n_written = 0
+        if max_workers == 1:
+            for job in jobs:
+                try:
+                    write_mouse_partition(*job)
+                    n_written += 1
+                except Exception as e:
+                    print(f"Could not add {job[0]} to the dataset: {e}")
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(write_mouse_partition, *job): job for job in jobs
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        n_written += 1
+                    except Exception as e:
+                        print(f"Could not add {futures[future][0]} to the dataset: {e}")
+        if n_written > 0:
+            with self._lock:
+                self._dataset = None
+        return n_written
+
+    def get_dataset(self):
+        # the schema is the union of the schemas of all the mice, as the
+        # tasks do not all write the same columns
+        with self._lock:
+            if self._dataset is not None:
+                return self._dataset
+            if not self.dataset_dir.is_dir():
+                return None
+            files = sorted(str(path) for path in self.dataset_dir.glob(f"*/*/{DATA_FILE}"))
+            if len(files) == 0:
+                return None
+            schema = pa.unify_schemas(
+                [pq.read_schema(path) for path in files], promote_options="permissive"
+            )
+            partitioning = ds.partitioning(
+                pa.schema([("project", pa.string()), ("mouse", pa.string())]),
+                flavor="hive",
+            )
+            schema = pa.unify_schemas([schema, partitioning.schema])
+            self._dataset = ds.dataset(
+                files,
+                schema=schema,
+                format="parquet",
+                partitioning=partitioning,
+                partition_base_dir=str(self.dataset_dir),
+            )
+            return self._dataset
+
+    def get_columns(self):
+        dataset = self.get_dataset()
+        return [] if dataset is None else dataset.schema.names
+
+    def get_filter(self, projects=None, mice=None, start=None, end=None, filter=None):
+        # projects and mice select the partitions, start and end the days
+        expression = None
+        conditions = []
+        if projects is not None:
+            conditions.append(ds.field("project").isin(list(projects)))
+        if mice is not None:
+            conditions.append(ds.field("mouse").isin(list(mice)))
+        if start is not None:
+            conditions.append(ds.field(DAY_COLUMN) >= pa.scalar(to_date(start), pa.date32()))
+        if end is not None:
+            conditions.append(ds.field(DAY_COLUMN) <= pa.scalar(to_date(end), pa.date32()))
+        if filter is not None:
+            conditions.append(filter)
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def scan(self, columns=None, batch_size=65536, **filters):
+        # pyarrow scanner reading only the columns and rows asked for
+        dataset = self.get_dataset()
+        if dataset is None:
+            return None
+        return dataset.scanner(
+            columns=columns, filter=self.get_filter(**filters), batch_size=batch_size
+        )
+
+    def query(self, columns=None, **filters):
+        # the trials selected, as a dataframe
+        scanner = self.scan(columns, **filters)
+        if scanner is None:
+            return pd.DataFrame(columns=columns or [])
+        return scanner.to_table().to_pandas()
+
+    def aggregate(self, by, value="correct", **filters):
+        # trials and mean of value per group, computed batch by batch so
+        # that the selected trials are never all in memory
+        by = list(by)
+        result_columns = by + ["trials", value]
+        scanner = self.scan(list(dict.fromkeys(by + [value])), **filters)
+        if scanner is None:
+            return pd.DataFrame(columns=result_columns)
+        partials = []
+        for batch in scanner.to_batches():
+            if batch.num_rows == 0:
+                continue
+            table = pa.Table.from_batches([batch])
+            partials.append(
+                table.group_by(by).aggregate([(value, "sum"), (value, "count")]).to_pandas()
+            )
+        if len(partials) == 0:
+            return pd.DataFrame(columns=result_columns)
+        totals = pd.concat(partials).groupby(by, as_index=False, dropna=False).sum()
+        totals["trials"] = totals[f"{value}_count"]
+        totals[value] = totals[f"{value}_sum"] / totals[f"{value}_count"]
+        return totals[result_columns].sort_values(by, ignore_index=True)
+
+    def sql(self, query):
+        # run sql on the view trials with duckdb, if it is installed
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("sql queries need duckdb: pip install duckdb")
+        dataset = self.get_dataset()
+        if dataset is None:
+            raise ValueError("The trial dataset is empty, run update first")
+        connection = duckdb.connect()
+        try:
+            connection.register("trials", dataset)
+            return connection.execute(query).df()
+        finally:
+            connection.close()
@@ -0,0 +1,141 @@
+# matplotlib reports rendered in background worker processes and stored as
+# png files, keyed by mouse, session and data version, so that the server
+# only sends files and never waits for matplotlib in a callback
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from flask import abort, send_from_directory
+from werkzeug.security import safe_join
+
+from behavior_data_visualizer import disk_cache
+
+SUBJECT_PROGRESS = "subject_progress"
+SESSION_SUMMARY = "session_summary"
+REPORT_KINDS = (SUBJECT_PROGRESS, SESSION_SUMMARY)
+# session of the reports that cover all the sessions of a mouse
+ALL_SESSIONS = "all"
+# seconds the browser can reuse a report, their names change with the data
+REPORT_MAX_AGE = 24 * 3600
+
+
+def get_file_name(kind, session, version):
+    return f"{kind}_{session}_{version}.png"
+
+
+class ReportStore:
+    # <cache_dir>/<project>/<mouse>/<kind>_<session>_<version>.png
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = disk_cache.get_cache_dir() / "reports"
+        self.cache_dir = cache_dir
+
+    def get_path(self, project_name, mouse_name, kind, session, version):
+        return (
+            self.cache_dir
+            / project_name
+            / mouse_name
+            / get_file_name(kind, session, version)
+        )
+
+    def get_url(self, project_name, mouse_name, kind, session, version):
+        parts = [project_name, mouse_name, get_file_name(kind, session, version)]
+        return "/reports/" + "/".join(quote(str(part), safe="") for part in parts)
+
+
+def save_figure(fig, path):
+    # save a matplotlib figure next to its final path and move it in place
+    import matplotlib.pyplot as plt
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        fig.savefig(tmp_path, format="png")
+    finally:
+        plt.close(fig)
+    os.replace(tmp_path, path)
+
+
+def remove_other_versions(path):
+    # the reports of older versions of the same kind and session
+    kind_session = path.name.rsplit("_", 1)[0]
+    for old_path in path.parent.glob(f"{kind_session}_*.png"):
+        if old_path != path:
+            try:
+                old_path.unlink()
+            except OSError:
+                pass
+
+
+class ReportRenderer:
+    # renders the reports that are not in the store with render_function
+    # (csv_path, mouse_name, kind, session, path), a module level function
+    # so that it can run in the worker processes
+    def __init__(self, store, render_function, max_workers=2, executor=None):
+        self.store = store
+        self.render_function = render_function
+        if executor is None:
+            # spawned, the server has threads running that forking would copy
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        self._executor = executor
+        # path -> future of the reports being rendered
+        self._pending = {}
+        # path -> error of the reports that could not be rendered
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def request(self, project_name, mouse_name, kind, session, version, csv_path):
+        # url of the report if it is ready, None while it is rendered
+        path = self.store.get_path(project_name, mouse_name, kind, session, version)
+        if path.is_file():
+            return self.store.get_url(project_name, mouse_name, kind, session, version)
+        with self._lock:
+            if path in self._pending or path in self.errors:
+                return None
+            future = self._executor.submit(
+                self.render_function, str(csv_path), mouse_name, kind, session, path
+            )
+            self._pending[path] = future
+        future.add_done_callback(lambda future: self._done(path, future))
+        return None
+
+    def _done(self, path, future):
+        with self._lock:
+            self._pending.pop(path, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                print(f"Could not render {path.name}: {error}")
+                self.errors[path] = error
+
+    def get_error(self, project_name, mouse_name, kind, session, version):
+        path = self.store.get_path(project_name, mouse_name, kind, session, version)
+        with self._lock:
+            return self.errors.get(path)
+
+    def n_pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def register_report_route(server, store):
+    @server.route("/reports/<project_name>/<mouse_name>/<file_name>")
+    def serve_report(project_name, mouse_name, file_name):
+        directory = safe_join(str(store.cache_dir), project_name, mouse_name)
+        if directory is None or not os.path.isdir(directory):
+            abort(404)
+        # send_from_directory refuses names that leave the directory
+        return send_from_directory(
+            directory, file_name, mimetype="image/png", max_age=REPORT_MAX_AGE
+        )
+
+    return serve_report
@@ -0,0 +1,120 @@
+# dtypes of the Training Village session csv files. pd.read_csv infers
+# object strings and 64 bit numbers, which makes a mouse with a long
+# history take several times the memory it needs
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# stored with the cached copies, increase it when the dtypes change
+SCHEMA_VERSION = 1
+
+# columns with few distinct values, parsed directly as categoricals
+CATEGORY_COLUMNS = [
+    "subject",
+    "task",
+    "date",
+    "stimulus_modality",
+    "current_training_stage",
+    "correct_side",
+    "first_trial_response",
+]
+
+# absolute timestamps in seconds, float32 would round them to minutes
+FLOAT64_COLUMNS = ["TRIAL_START", "TRIAL_END"]
+
+# counters, downcast after parsing as they may have missing values
+INTEGER_COLUMNS = ["trial", "session"]
+
+# other string columns are made categorical if they repeat this much
+MAX_CATEGORY_RATIO = 0.5
+
+CSV_DTYPES = {
+    **{column: "category" for column in CATEGORY_COLUMNS},
+    **{column: "float64" for column in FLOAT64_COLUMNS},
+}
+
+
+def use_column(column):
+    # drop the empty columns created by a trailing separator
+    return not column.startswith("Unnamed")
+
+
+def get_read_csv_kwargs():
+    return {"dtype": CSV_DTYPES, "usecols": use_column}
+
+
+def is_timestamp_column(column):
+    return (
+        column in FLOAT64_COLUMNS
+        or column.endswith("_START")
+        or column.endswith("_END")
+    )
+
+
+def is_string_column(series):
+    return series.dtype == object or isinstance(
+        series.dtype, pd.StringDtype
+    )
+
+
+def compact_dtypes(df):
+    for column in df.columns:
+        series = df[column]
+        if column in INTEGER_COLUMNS:
+            df[column] = pd.to_numeric(series, downcast="integer")
+        elif series.dtype == "float64" and not is_timestamp_column(column):
+            df[column] = series.astype("float32")
+        elif series.dtype == "int64":
+            df[column] = pd.to_numeric(series, downcast="integer")
+        elif is_string_column(series) and len(series) > 0:
+            try:
+                n_values = series.nunique()
+            except TypeError:
+                # unhashable values, leave the column as it is
+                continue
+            if n_values <= MAX_CATEGORY_RATIO * len(series):
+                df[column] = series.astype("category")
+    return df
+
+
+def concat_frames(df, tail):
+    # concatenate keeping the categoricals, pandas turns them into objects
+    # when the categories of both frames are different
+    df = df.copy(deep=False)
+    tail = tail.copy(deep=False)
+    for column in df.columns.intersection(tail.columns):
+        old, new = df[column], tail[column]
+        old_is_category = isinstance(old.dtype, pd.CategoricalDtype)
+        new_is_category = isinstance(new.dtype, pd.CategoricalDtype)
+        if not old_is_category:
+            continue
+        if not new_is_category or new.cat.categories.dtype != old.cat.categories.dtype:
+            # the tail may be parsed as another type, e.g. as floats when
+            # all its values are empty
+            if new.isna().all():
+                new = new.astype(old.dtype)
+            else:
+                new = new.astype(old.cat.categories.dtype).astype("category")
+        if not old.cat.categories.equals(new.cat.categories):
+            categories = union_categoricals(
+                [old, new], ignore_order=True
+            ).categories
+            df[column] = old.cat.set_categories(categories)
+            tail[column] = new.cat.set_categories(categories)
+        else:
+            tail[column] = new
+    return pd.concat([df, tail], ignore_index=True)
+
+
+def concat_chunks(chunks):
+    # concatenate the chunks of a csv, with the categories of all of them
+    if len(chunks) == 1:
+        return chunks[0]
+    chunks = [chunk.copy(deep=False) for chunk in chunks]
+    for column in chunks[0].columns:
+        columns = [chunk[column] for chunk in chunks]
+        if not all(isinstance(c.dtype, pd.CategoricalDtype) for c in columns):
+            continue
+        categories = union_categoricals(columns, ignore_order=True).categories
+        for chunk, values in zip(chunks, columns):
+            chunk[column] = values.cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,146 @@
+# generate synthetic Training Village data to benchmark and test the app
+# without access to the lab archive
+# usage: python -m behavior_data_visualizer.synthetic /tmp/bdv_data --n_mice=20 --videos
+from pathlib import Path
+
+import fire
+import numpy as np
+import pandas as pd
+
+MODALITIES = ["visual", "auditory", "multisensory"]
+
+
+def make_mouse_df(
+    mouse_name,
+    n_days=30,
+    trials_per_day=500,
+    sessions_per_day=1,
+    task="TwoAFC",
+    start_date="2024-01-01",
+    seed=0,
+):
+    rng = np.random.default_rng(seed)
+    frames = []
+    session = 0
+    for day in pd.date_range(start_date, periods=n_days, freq="D"):
+        # split the trials of the day between the sessions
+        bounds = np.linspace(0, trials_per_day, sessions_per_day + 1)
+        for s in range(sessions_per_day):
+            n_trials = int(bounds[s + 1]) - int(bounds[s])
+            if n_trials == 0:
+                continue
+            session += 1
+            session_start = day + pd.Timedelta(hours=9 + 3 * s)
+            date = session_start.strftime("%Y-%m-%d %H:%M:%S")
+            # trials of a few seconds each
+            trial_start = session_start.timestamp() + np.cumsum(
+                rng.uniform(3, 9, n_trials)
+            )
+            evidence = rng.choice([-1, -0.5, -0.25, 0.25, 0.5, 1], n_trials)
+            correct_side = np.where(evidence > 0, "left", "right")
+            p_correct = 0.5 + 0.45 * np.abs(evidence)
+            correct = rng.uniform(size=n_trials) < p_correct
+            response = np.where(
+                correct,
+                correct_side,
+                np.where(correct_side == "left", "right", "left"),
+            )
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "subject": mouse_name,
+                        "task": task,
+                        "date": date,
+                        "session": session,
+                        "trial": np.arange(1, n_trials + 1),
+                        "TRIAL_START": trial_start,
+                        "TRIAL_END": trial_start + rng.uniform(2, 3, n_trials),
+                        "stimulus_modality": rng.choice(MODALITIES, n_trials),
+                        "correct_side": correct_side,
+                        "first_trial_response": response,
+                        "correct": correct,
+                        "leftward_evidence": evidence,
+                        "current_training_stage": "TwoAFC_visual_hard",
+                    }
+                )
+            )
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_video_name(mouse_name, task, date):
+    # as get_video_path names them, <mouse>_<task>_<YYYYMMDD_HHMMSS>.mp4
+    date = date.replace("-", "").replace(":", "").replace(" ", "_")
+    return f"{mouse_name}_{task}_{date}.mp4"
+
+
+def write_videos(root, project_name, mouse_name, df, video_bytes=1024**2):
+    # one empty video per session at <root>/<project>/videos/<mouse>/,
+    # sparse so that large sizes take no disk space
+    videos_path = Path(root) / project_name / "videos" / mouse_name
+    videos_path.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for task, date in df[["task", "date"]].drop_duplicates().itertuples(index=False):
+        path = videos_path / get_video_name(mouse_name, task, date)
+        with open(path, "wb") as f:
+            f.truncate(video_bytes)
+        paths.append(path)
+    return paths
+
+
+def write_mouse_csv(
+    root, project_name, mouse_name, videos=False, video_bytes=1024**2, **kwargs
+):
+    # <root>/<project>/sessions/<mouse>/<mouse>.csv, as written by Training Village
+    mouse_path = Path(root) / project_name / "sessions" / mouse_name
+    mouse_path.mkdir(parents=True, exist_ok=True)
+    csv_path = mouse_path / f"{mouse_name}.csv"
+    df = make_mouse_df(mouse_name, **kwargs)
+    df.to_csv(csv_path, sep=";", index=False)
+    if videos:
+        write_videos(root, project_name, mouse_name, df, video_bytes)
+    return csv_path
+
+
+def write_project(root, project_name, n_mice=10, **kwargs):
+    paths = []
+    for i in range(n_mice):
+        mouse_name = f"mouse{i:03d}"
+        paths.append(
+            write_mouse_csv(root, project_name, mouse_name, seed=i, **kwargs)
+        )
+    return paths
+
+
+def write_data_root(root, n_projects=1, n_mice=10, **kwargs):
+    # a data root with projects named project00, project01...
+    paths = []
+    for i in range(n_projects):
+        paths += write_project(root, f"project{i:02d}", n_mice=n_mice, **kwargs)
+    return paths
+
+
+def main(
+    root,
+    n_projects=1,
+    n_mice=10,
+    n_days=30,
+    trials_per_day=500,
+    sessions_per_day=1,
+    videos=False,
+    video_mb=1,
+):
+    paths = write_data_root(
+        root,
+        n_projects=n_projects,
+        n_mice=n_mice,
+        n_days=n_days,
+        trials_per_day=trials_per_day,
+        sessions_per_day=sessions_per_day,
+        videos=videos,
+        video_bytes=int(video_mb * 1024**2),
+    )
+    print(f"{len(paths)} mice written to {root}")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -1,11 +1,34 @@
 import io
+import os
+import json
 import base64
-from lecilab_behavior_analysis import utils as ut
-from lecilab_behavior_analysis import df_transforms as dft
-import plotly.express as px
+import functools
 import socket
 import pandas as pd
 from pathlib import Path
+from werkzeug.security import safe_join
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from behavior_data_visualizer import aggregates, derived, reports
+from behavior_data_visualizer.day_view import DayView
+from behavior_data_visualizer.loader import MouseDataLoader, get_complete_size
+
+# window of the rolling performance stored in the aggregates
+AGGREGATE_WINDOW = 50
+
+# the data root is given with --data_path, this environment variable or the
+# data_path of the json config file, and is otherwise found from the hostname
+DATA_PATH_ENV = 'BDV_DATA_PATH'
+CONFIG_PATH_ENV = 'BDV_CONFIG'
+DEFAULT_CONFIG_PATH = Path.home() / '.config' / 'behavior_data_visualizer' / 'config.json'
+HOSTNAME_DATA_PATHS = {
+    "headnode": "/archive/training_village/",
+    "minibaps": "/archive/training_village/",
+    "minibaps2": "/archive/training_village/",
+    "tectum": "/mnt/c/Users/HMARTINEZ/LeCiLab/data/behavioral_data/",
+}
+
+# DataCatalog used for the listings, see set_catalog
+catalog = None
 
 def set_mouse_data_dict(data_dict):
     global mouse_data_dict
@@ -20,102 +43,92 @@ def fig_to_uri(fig):
     return f'data:image/png;base64,{fig_data}'
 
 def get_dicctionary_of_sessions(df):
-    sessions_dict = {}
-    for session in df['session'].unique():
-        # get the date of each of the session
-        date = df[df['session'] == session]['date'].unique()[0]
-        key = str(date) + ' - Session: ' + str(session)
-        sessions_dict[key] = session
-    return sessions_dict
+    # first date of each session, in one pass instead of a filter per session
+    first_rows = df[['session', 'date']].drop_duplicates('session')
+    return {
+        str(date) + ' - Session: ' + str(session): session
+        for session, date in zip(first_rows['session'], first_rows['date'])
+    }
 
 def get_diccionary_of_dates(df):
-    dates_dict = {}
-    for date in df['year_month_day'].unique():
-        key = str(date)
-        dates_dict[key] = date
-    return dates_dict
+    # the days in order of appearance, a single pass over the column
+    days = df['year_month_day'].unique()
+    return {str(date): date for date in days}
 
-def display_click_data(clickData, df):
+def get_date_from_click_data(clickData):
     try:
-        date = clickData['points'][0]['customdata'][0]
-    except:
+        return clickData['points'][0]['customdata'][0]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def get_day_df(df, date, day_index=None):
+    # slice the day from the index if there is one, instead of scanning
+    if day_index is not None:
+        return day_index.get_day(df, date)
+    return df[df['year_month_day'] == date]
+
+def display_click_data(clickData, df, day_index=None):
+    date = get_date_from_click_data(clickData)
+    if date is None:
         return 'No date selected'
-    # select the dataset
-    sdf = df[df['year_month_day'] == date]
-    try:
-        text_to_return = ut.get_text_from_subset_df(sdf)
-    except:
-        text_to_return = 'Error retrieving data'
-    return text_to_return
-
-# # Update the performance figure
-# @app.callback(
-#     dash.dependencies.Output('single-mouse-performance', 'figure'),
-#     [dash.dependencies.Input('reactive-calendar', 'clickData'),
-#     dash.dependencies.Input('single-mouse-dropdown', 'value')],
-# )
-def update_performance_figure(clickData, df):
-    try:
-        date = clickData['points'][0]['customdata'][0]
-    except:
+    day_df = get_day_df(df, date, day_index)
+    return derived.get_day_text(derived.get_day_summaries(day_df), date)
+
+
+def get_day_summaries(loader):
+    # summaries of all the days of a loaded mouse, updated with the days of
+    # the trials appended since they were computed
+    return loader.get_derived(
+        'day_summaries', derived.get_day_summaries, update=derived.update_day_summaries
+    )
+
+
+def update_performance_figure(clickData, df, day_index=None, window=50):
+    date = get_date_from_click_data(clickData)
+    if date is None:
+        return {}
+    return DayView(df, date, day_index, window).get_performance_figure()
+
+
+def update_psychometric_figure(clickData, df, day_index=None):
+    date = get_date_from_click_data(clickData)
+    if date is None:
         return {}
-    # select the dataset
-    sdf = df[df['year_month_day'] == date]
-    sdf = dft.get_performance_through_trials(sdf, window=50)
-    # find the index of the session changes and add as vertical lines to the performance plot
-    session_changes = sdf[sdf.session != sdf.session.shift(1)].index
-    if "stimulus_modality" not in sdf.columns:
-        sdf['stimulus_modality'] = 'unknown'
-    fig = px.scatter(
-        sdf,
-        x='total_trial',
-        y='performance_w',
-        color='stimulus_modality',
-        hover_data={
-            'total_trial': True,
-            'performance_w': True,
-            'subject': False,
-            'task': False,
-            'date': True,
-            'trial': False,
-            })
-    # add vertical lines for session changes
-    for session_change in session_changes[1:]:
-        total_trial = sdf.loc[session_change, 'total_trial']
-        fig.add_vline(x=total_trial, line_width=1, line_dash="dash", line_color="grey")
-    # put legend inside the plot
-    fig.update_layout(legend=dict(
-        orientation='h',
-        yanchor='bottom',
-        y=1.02,
-        xanchor='right',
-        x=1
-    ))
-
-    return fig
-
-
-def update_psychometric_figure(clickData, df):
+    return DayView(df, date, day_index).get_psychometric_figure()
+
+
+def read_config():
+    config_path = os.environ.get(CONFIG_PATH_ENV, DEFAULT_CONFIG_PATH)
     try:
-        date = clickData['points'][0]['customdata'][0]
-    except:
+        with open(config_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
         return {}
-    # select the dataset
-    sdf = df[df['year_month_day'] == date]
-    pdf = dft.get_performance_by_difficulty(sdf)
-    fig = px.scatter(pdf, x='leftward_evidence', y='leftward_choices')
-    return fig
 
 
+@functools.lru_cache(maxsize=None)
 def get_data_path():
-    hostname = socket.gethostname()
-    paths = {
-        "headnode": "/archive/training_village/",
-        "minibaps": "/archive/training_village/",
-        "minibaps2": "/archive/training_village/",
-        "tectum": "/mnt/c/Users/HMARTINEZ/LeCiLab/data/behavioral_data/",
-    }
-    return paths.get(hostname, None)
+    # with a trailing separator, the callers add the project names to it
+    data_path = (
+        os.environ.get(DATA_PATH_ENV)
+        or read_config().get('data_path')
+        or HOSTNAME_DATA_PATHS.get(socket.gethostname())
+    )
+    if data_path is None:
+        return None
+    return os.path.join(str(data_path), '')
+
+
+def set_data_path(data_path):
+    # in the environment, so that worker processes use it too
+    os.environ[DATA_PATH_ENV] = str(data_path)
+    get_data_path.cache_clear()
+
+
+def add_day_column(df):
+    # the analysis package is only imported once there is data to transform
+    from lecilab_behavior_analysis import df_transforms as dft
+    return dft.add_day_column_to_df(df)
 
 
 def display_video(clickData):
@@ -129,7 +142,7 @@ def display_video(clickData):
     return total_trial
 
 
-def get_video_path(project_name, mouse_name, task, date, trial):
+def get_video_path(project_name, mouse_name, task, date, trial=None):
     # get the path to the video
     data_path = get_data_path()
     if data_path is None:
@@ -140,63 +153,216 @@ def get_video_path(project_name, mouse_name, task, date, trial):
     date = date.replace(' ', '_')
     # video_path = f"{data_path}/{mouse_name}/videos/{mouse_name}_{total_trial}.mp4"
     # return video_path
-    return f"{data_path}/{project_name}/videos/{mouse_name}/{mouse_name}_{task}_{date}.mp4"
+    # the names come from the video urls, None if they leave the data root
+    return safe_join(data_path, project_name, 'videos', mouse_name, f"{mouse_name}_{task}_{date}.mp4")
+
+
+def get_project_csv_paths(project_name):
+    outpath = get_data_path() + project_name + "/sessions/"
+    csv_paths = []
+    # get the animals from the path
+    for path in Path(outpath).iterdir():
+        # check if the path is a directory with a csv file
+        if path.is_dir() and (path / f'{path.name}.csv').is_file():
+            csv_paths.append(path / f'{path.name}.csv')
+    return csv_paths
+
+
+def load_csv_path(csv_path, use_cache=True):
+    # runs in the worker processes of iter_project_mice
+    loader = MouseDataLoader(
+        csv_path, transform=add_day_column, use_cache=use_cache
+    )
+    loader.load()
+    return Path(csv_path).parent.name, loader
+
+
+def iter_project_mice(project_name, max_workers=None, use_cache=True):
+    # yield (mouse_name, loader) as each mouse finishes loading
+    csv_paths = get_project_csv_paths(project_name)
+    yield from iter_mouse_csv_paths(csv_paths, max_workers, use_cache)
+
 
+def iter_mouse_csv_paths(csv_paths, max_workers=None, use_cache=True):
+    # max_workers=None uses all the cores, 1 loads them in this process
+    if max_workers == 1:
+        for csv_path in csv_paths:
+            yield load_csv_path(csv_path, use_cache)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(load_csv_path, csv_path, use_cache)
+            for csv_path in csv_paths
+        ]
+        for future in as_completed(futures):
+            yield future.result()
 
-def get_mouse_data_dict(project_name):
-        # Load the data
-        outpath = get_data_path() + project_name + "/sessions/"
-        # go through the tree and get the data
+
+def get_mouse_data_dict(project_name, max_workers=None):
+        # Load the data of all the mice in parallel
         m_data_dict = {}
-        
-        # get the animals from the path
-        for path in Path(outpath).iterdir():
-            # check if the path is a directory
-            if path.is_dir():
-                # check if the path has a csv file
-                if any(path.glob(f'{path.name}.csv')):
-                    data = pd.read_csv(path / f'{path.name}.csv', sep=';')
-                    # add columns
-                    data = dft.add_day_column_to_df(data)
-                    # add it to the dictionary
-                    m_data_dict[path.name] = data
+        for mouse_name, loader in iter_project_mice(project_name, max_workers):
+            m_data_dict[mouse_name] = loader.df
         # sort the dictionary
-        m_data_dict = dict(sorted(m_data_dict.items()))   
+        m_data_dict = dict(sorted(m_data_dict.items()))
         # pass it to utils to make it global
         set_mouse_data_dict(m_data_dict)
         # return the data
         return mouse_data_dict
 
 
-def load_mouse_data(project_name, mouse_name):
+def get_mouse_csv_path(project_name, mouse_name):
     outpath = get_data_path() + project_name + "/sessions/"
-    path = Path(outpath) / mouse_name
-    if path.is_dir():
-        if any(path.glob(f'{path.name}.csv')):
-            data = pd.read_csv(path / f'{path.name}.csv', sep=';')
-            # add columns
-            data = dft.add_day_column_to_df(data)
-            return data
-    return None
+    return Path(outpath) / mouse_name / f'{mouse_name}.csv'
+
+
+def read_mouse_csv(csv_path):
+    data = pd.read_csv(csv_path, sep=';')
+    # add columns
+    data = add_day_column(data)
+    return data
+
+
+def sort_mice_by_activity(project_name, mice):
+    # most recently modified csv first
+    def get_mtime(mouse_name):
+        if catalog is not None:
+            stat = catalog.get_csv_stat(project_name, mouse_name)
+            return 0 if stat is None else stat[1]
+        try:
+            return get_mouse_csv_path(project_name, mouse_name).stat().st_mtime
+        except OSError:
+            return 0
+    return sorted(mice, key=get_mtime, reverse=True)
 
 
-def get_seconds_of_trial(df, date, trial_number):
+def get_mouse_loader(project_name, mouse_name, use_cache=True):
+    csv_path = get_mouse_csv_path(project_name, mouse_name)
+    if not csv_path.is_file():
+        return None
+    return MouseDataLoader(
+        csv_path, transform=add_day_column, use_cache=use_cache
+    )
+
+
+def get_loaded_mouse(project_name, mouse_name, use_cache=True, progress=None):
+    loader = get_mouse_loader(project_name, mouse_name, use_cache)
+    if loader is None:
+        return None
+    loader.load(progress)
+    return loader
+
+
+def load_mouse_data(project_name, mouse_name, use_cache=True):
+    loader = get_loaded_mouse(project_name, mouse_name, use_cache)
+    if loader is None:
+        return None
+    return loader.df
+
+
+def get_seconds_of_trial(df, date, trial_number, trial_offsets=None):
+    # seconds from the start of the session video to the trial
+    if trial_offsets is None:
+        trial_offsets = derived.get_trial_offsets(df)
     try:
-        session_df = df[df.date == date]
-    except:
-        return {}
-    
-    # get the timestamp of the first trial
-    start_of_first_trial = session_df.iloc[0].TRIAL_START
-    # get the timestamp of the trial
-    trial_start = session_df[session_df['trial'] == trial_number].TRIAL_START.values[0]
-    # calculate the difference in seconds
-    trial_start_seconds = (trial_start - start_of_first_trial)
+        trial_start_seconds = trial_offsets.loc[(str(date), trial_number)]
+    except KeyError:
+        raise KeyError(f"Trial {trial_number} of session {date} not found")
+    if isinstance(trial_start_seconds, pd.Series):
+        # repeated trial numbers, take the first one
+        trial_start_seconds = trial_start_seconds.iloc[0]
+    return float(trial_start_seconds)
+
+
+def compute_mouse_aggregates(df):
+    from lecilab_behavior_analysis import df_transforms as dft
+    perf_df = dft.get_performance_through_trials(df, window=AGGREGATE_WINDOW)
+    return aggregates.compute_daily(perf_df), aggregates.compute_curve(perf_df)
 
-    return trial_start_seconds
+
+def update_aggregates(project_name, mouse_name, loader, store):
+    # compute and store the aggregates if the data changed since they were
+    stamp = store.read_stamp(project_name, mouse_name)
+    if stamp is not None and stamp.get('stamp') == loader.stamp:
+        return
+    daily, curve = loader.get_derived('aggregates', compute_mouse_aggregates)
+    store.write(
+        project_name, mouse_name, daily, curve,
+        {'stamp': loader.stamp, 'size': loader.offset},
+    )
+
+
+def get_complete_csv_size(project_name, mouse_name):
+    # bytes of the csv up to its last complete line, the size a loader of
+    # the whole file has parsed. From the file itself, the catalog can be
+    # a rescan behind
+    csv_path = get_mouse_csv_path(project_name, mouse_name)
+    try:
+        return get_complete_size(csv_path, csv_path.stat().st_size)
+    except OSError:
+        return None
+
+
+def aggregates_are_current(project_name, mouse_name, store):
+    # the stored aggregates were computed from the whole csv
+    stamp = store.read_stamp(project_name, mouse_name)
+    return stamp is not None and stamp.get('size') == get_complete_csv_size(project_name, mouse_name)
+
+
+def get_mouse_aggregates(project_name, mouse_name, store):
+    # (daily, curve) tables of a mouse, read from the store if they are up
+    # to date with its csv and None otherwise: nothing is computed here,
+    # update_aggregates and update_project_aggregates run in the background
+    if not aggregates_are_current(project_name, mouse_name, store):
+        return None
+    return store.read(project_name, mouse_name)
+
+
+def update_project_aggregates(project_name, store, use_cache=True):
+    # compute the aggregates of the mice of a project that are missing or
+    # out of date, loading one mouse at a time. Returns the mice updated
+    updated = []
+    for mouse_name in get_list_of_mice(project_name):
+        if aggregates_are_current(project_name, mouse_name, store):
+            continue
+        try:
+            loader = get_loaded_mouse(project_name, mouse_name, use_cache)
+            if loader is None:
+                continue
+            update_aggregates(project_name, mouse_name, loader, store)
+        except Exception as e:
+            print(f"Could not compute the aggregates of {mouse_name}: {e}")
+            continue
+        updated.append(mouse_name)
+    return updated
+
+
+def render_report(csv_path, mouse_name, kind, session, path):
+    # runs in the worker processes of the ReportRenderer, matplotlib and the
+    # figure maker are only imported there
+    import matplotlib
+    matplotlib.use('Agg')
+    from lecilab_behavior_analysis import figure_maker as fm
+    loader = MouseDataLoader(csv_path, transform=add_day_column)
+    loader.load()
+    if kind == reports.SUBJECT_PROGRESS:
+        fig = fm.subject_progress_figure(loader.df)
+    else:
+        sdf = get_day_df(loader.df, session, loader.day_index)
+        fig = fm.session_summary_figure(sdf, mouse_name, perf_window=25)
+    reports.save_figure(fig, path)
+    reports.remove_other_versions(path)
+
+
+def set_catalog(data_catalog):
+    # serve the listings from a DataCatalog instead of the file system
+    global catalog
+    catalog = data_catalog
 
 
 def get_list_of_projects():
+    if catalog is not None:
+        return catalog.get_projects()
     data_path = get_data_path()
     if data_path is None:
         return []
@@ -208,6 +374,8 @@ def get_list_of_projects():
 
 
 def get_list_of_mice(project_name):
+    if catalog is not None:
+        return catalog.get_mice(project_name)
     data_path = get_data_path()
     if data_path is None:
         return []
@@ -217,4 +385,10 @@ def get_list_of_mice(project_name):
         if path.is_dir():
             mice.append(path.name)
     # sort the list
-    return sorted(mice)
\ No newline at end of file
+    return sorted(mice)
+
+
+def video_exists(video_path):
+    if catalog is not None:
+        return catalog.video_exists(video_path)
+    return os.path.isfile(video_path)
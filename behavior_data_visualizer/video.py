@@ -0,0 +1,78 @@
+# serve the session videos straight from the archive, with range requests
+# so that the browser can seek without downloading the whole file
+import os
+import threading
+from urllib.parse import quote
+
+from flask import abort, send_file
+
+# seconds the browser can reuse a video before checking it again
+VIDEO_MAX_AGE = 3600
+
+
+class VideoIndex:
+    # path of the video of each (project, subject, task, session date),
+    # so that the archive is only checked the first time a video is opened
+    def __init__(self, get_path, exists=os.path.isfile):
+        # function (project, subject, task, date) -> path, e.g. get_video_path
+        self.get_path = get_path
+        self.exists = exists
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def get(self, project_name, subject, task, date):
+        key = (project_name, subject, task, date)
+        with self._lock:
+            path = self._paths.get(key)
+        if path is not None:
+            return path
+        path = self.get_path(project_name, subject, task, date)
+        if path is None or not self.exists(path):
+            return None
+        with self._lock:
+            self._paths[key] = path
+        return path
+
+    def forget(self, project_name, subject, task, date):
+        with self._lock:
+            self._paths.pop((project_name, subject, task, date), None)
+
+
+def is_path_segment(value):
+    # a single file or directory name, the parts of the video urls are
+    # used to build the path of the video
+    return value not in ("", ".", "..") and not any(
+        separator in value for separator in ("/", "\\", os.sep)
+    )
+
+
+def get_video_url(project_name, subject, task, date):
+    parts = [project_name, subject, task, date]
+    return "/video/" + "/".join(quote(str(part), safe="") for part in parts)
+
+
+def register_video_route(server, video_index):
+    @server.route("/video/<project_name>/<subject>/<task>/<date>")
+    def serve_session_video(project_name, subject, task, date):
+        if not all(is_path_segment(part) for part in (project_name, subject, task, date)):
+            abort(404)
+        path = video_index.get(project_name, subject, task, date)
+        if path is None:
+            abort(404)
+        try:
+            # conditional answers 206 to range requests and 304 to
+            # requests with a matching etag or date, and the file is sent
+            # with sendfile by servers that support wsgi.file_wrapper
+            return send_file(
+                path,
+                mimetype="video/mp4",
+                conditional=True,
+                etag=True,
+                max_age=VIDEO_MAX_AGE,
+            )
+        except FileNotFoundError:
+            # the video was moved since it was indexed
+            video_index.forget(project_name, subject, task, date)
+            abort(404)
+
+    return serve_session_video
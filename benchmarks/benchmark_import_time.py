@@ -0,0 +1,57 @@
+# time importing the modules of the app in a fresh interpreter, alone and
+# followed by the heavy packages they now import only when needed
+# usage: python benchmarks/benchmark_import_time.py --repeats=5
+import importlib.util
+import subprocess
+import sys
+
+import fire
+
+MODULES = [
+    "behavior_data_visualizer.utils",
+    "behavior_data_visualizer.batch",
+    "behavior_data_visualizer.main",
+]
+DEFERRED = ["plotly.express", "plotly_calplot", "matplotlib.pyplot"]
+
+
+def time_import(modules, repeats):
+    code = (
+        "import time; start = time.perf_counter()\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + "print(time.perf_counter() - start)"
+    )
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        if output.returncode != 0:
+            return None
+        times.append(float(output.stdout))
+    return min(times)
+
+
+def is_installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def main(repeats=5):
+    deferred = [module for module in DEFERRED if is_installed(module)]
+    print(f"eager also imports {', '.join(deferred)}")
+    print(f"{'module':40s} {'startup':>10s} {'eager':>10s}")
+    for module in MODULES:
+        lazy = time_import([module], repeats)
+        eager = time_import([module] + deferred, repeats)
+        if lazy is None:
+            print(f"{module:40s} could not be imported")
+            continue
+        eager = "-" if eager is None else f"{eager * 1000:8.0f}ms"
+        print(f"{module:40s} {lazy * 1000:8.0f}ms {eager:>10s}")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,430 @@
+# load test of the dashboard: simulated users replay what a browser sends
+# to _dash-update-component when someone picks a project and a mouse, clicks
+# a day of the calendar and a point of the performance, and seeks the video,
+# against a server started on synthetic data. Reports the latency
+# percentiles of each step, the throughput and the memory of the server
+# usage: python benchmarks/benchmark_load_test.py --users="[1,4,16]" --duration_s=60
+# with --gunicorn_workers=4 the server is gunicorn running create_server
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import fire
+import numpy as np
+import pandas as pd
+import requests
+
+from behavior_data_visualizer import disk_cache, synthetic, utils, video
+
+STEPS = ["mice", "load", "calendar", "day", "video", "seek"]
+# bytes of video read by a seek, about a second of video
+SEEK_BYTES = 256 * 1024
+# a load still polled after this long counts as failed
+LOAD_TIMEOUT_S = 120
+
+
+def get_free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_tree_rss(pid):
+    # resident memory of a process and its children, e.g. the gunicorn
+    # workers, None where /proc is not available
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+    try:
+        children = []
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children += [int(child) for child in f.read().split()]
+    except OSError:
+        children = []
+    for child in children:
+        rss += get_tree_rss(child) or 0
+    return rss
+
+
+def get_percentiles(latencies):
+    if len(latencies) == 0:
+        return [np.nan] * 3
+    return np.percentile(np.asarray(latencies) * 1000, [50, 95, 99]).tolist()
+
+
+class DashClient:
+    # posts callbacks the way the dash renderer does, from the callback
+    # definitions of the server
+    def __init__(self, base_url, dependencies):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.callbacks = {}
+        for dependency in dependencies:
+            outputs = self.parse_outputs(dependency["output"])
+            self.callbacks[outputs[0]["id"] + "." + outputs[0]["property"].split("@")[0]] = (
+                dependency,
+                outputs,
+            )
+
+    @staticmethod
+    def parse_outputs(output):
+        # "id.prop" or "..id.prop...id.prop.." for several outputs
+        if output.startswith(".."):
+            parts = output[2:-2].split("...")
+        else:
+            parts = [output]
+        return [
+            {"id": part.rsplit(".", 1)[0], "property": part.rsplit(".", 1)[1]}
+            for part in parts
+        ]
+
+    def call(self, output, values, changed):
+        # values by "id.property" of the inputs and states of the callback
+        # whose first output is output, changed the inputs that triggered it
+        dependency, outputs = self.callbacks[output]
+
+        def get_args(dependencies):
+            return [
+                {
+                    "id": d["id"],
+                    "property": d["property"],
+                    "value": values.get(f"{d['id']}.{d['property']}"),
+                }
+                for d in dependencies
+            ]
+
+        body = {
+            "output": dependency["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": get_args(dependency["inputs"]),
+            "state": get_args(dependency["state"]),
+            "changedPropIds": changed,
+        }
+        response = self.session.post(
+            self.base_url + "/_dash-update-component", json=body, timeout=120
+        )
+        if response.status_code == 204:
+            # PreventUpdate
+            return {}
+        response.raise_for_status()
+        return response.json()["response"]
+
+
+class SimulatedUser:
+    def __init__(self, base_url, dependencies, sessions, think_s, poll_s, seed):
+        self.client = DashClient(base_url, dependencies)
+        self.base_url = base_url
+        # (project, mouse) -> dataframe of the dates and trials of its sessions
+        self.sessions = sessions
+        self.think_s = think_s
+        self.poll_s = poll_s
+        self.random = random.Random(seed)
+        # the id of the page, given by the layout of each page load
+        self.client_id = f"user{seed}"
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.requests = 0
+
+    def step(self, name, function):
+        start = time.perf_counter()
+        try:
+            result = function()
+        except Exception as e:
+            self.errors[name] += 1
+            if self.errors[name] == 1:
+                print(f"{name} failed: {e}")
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        return result
+
+    def think(self):
+        time.sleep(self.random.uniform(0, 2 * self.think_s))
+
+    def call(self, output, values, changed):
+        self.requests += 1
+        return self.client.call(output, values, changed)
+
+    def load_mouse(self, project, mouse):
+        # the interval polls the load until the data is there
+        values = {
+            "projects-dropdown.value": project,
+            "single-mouse-dropdown.value": mouse,
+            "client-id.data": self.client_id,
+        }
+        changed = ["single-mouse-dropdown.value"]
+        n_polls = 0
+        deadline = time.perf_counter() + LOAD_TIMEOUT_S
+        while True:
+            response = self.call("mouse-data-loaded.data", values, changed)
+            data = response.get("mouse-data-loaded", {}).get("data")
+            if response.get("loading-interval", {}).get("disabled", True):
+                if not data:
+                    raise RuntimeError(f"{mouse} was not loaded")
+                return data
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"{mouse} was not loaded in {LOAD_TIMEOUT_S} s")
+            time.sleep(self.poll_s)
+            n_polls += 1
+            values["loading-interval.n_intervals"] = n_polls
+            changed = ["loading-interval.n_intervals"]
+
+    def run_once(self):
+        project, mouse = self.random.choice(list(self.sessions))
+        sessions = self.sessions[(project, mouse)]
+        values = {"projects-dropdown.value": project, "client-id.data": self.client_id}
+        self.step(
+            "mice",
+            lambda: self.call("single-mouse-dropdown.options", values, ["projects-dropdown.value"]),
+        )
+        self.think()
+        data = self.step("load", lambda: self.load_mouse(project, mouse))
+        if data is None:
+            return
+        values.update(
+            {
+                "single-mouse-dropdown.value": mouse,
+                "mouse-data-loaded.data": data,
+                "calendar-metric.value": self.random.choice(["trials", "performance"]),
+            }
+        )
+        self.step(
+            "calendar",
+            lambda: self.call("reactive-calendar.figure", values, ["mouse-data-loaded.data"]),
+        )
+        self.think()
+        session = sessions.iloc[self.random.randrange(len(sessions))]
+        values["reactive-calendar.clickData"] = {
+            "points": [{"customdata": [str(session["date"])[:10]]}]
+        }
+        self.step(
+            "day",
+            lambda: self.call("single-mouse-text.children", values, ["reactive-calendar.clickData"]),
+        )
+        self.think()
+        trial = self.random.randint(1, int(session["trials"]))
+        values["single-mouse-performance.clickData"] = {
+            "points": [{"customdata": [mouse, session["task"], session["date"], trial]}]
+        }
+        self.step(
+            "video",
+            lambda: self.call(
+                "single-mouse-video.children", values, ["single-mouse-performance.clickData"]
+            ),
+        )
+        # the player asks for the bytes around the trial
+        url = self.base_url + video.get_video_url(project, mouse, session["task"], session["date"])
+        self.step("seek", lambda: self.seek(url))
+        self.think()
+
+    def seek(self, url):
+        # the size of the video, then the bytes from a random position
+        self.requests += 2
+        size = int(self.client.session.head(url, timeout=60).headers["Content-Length"])
+        start = self.random.randrange(max(1, size - SEEK_BYTES))
+        response = self.client.session.get(
+            url, headers={"Range": f"bytes={start}-{start + SEEK_BYTES - 1}"}, timeout=60
+        )
+        if response.status_code != 206:
+            raise RuntimeError(f"the video answered {response.status_code}")
+
+    def run(self, deadline):
+        while time.perf_counter() < deadline:
+            self.run_once()
+
+
+def get_sessions():
+    # the sessions of every mouse, for the clicks on days and trials
+    sessions = {}
+    for project in utils.get_list_of_projects():
+        for mouse in utils.get_list_of_mice(project):
+            df = pd.read_csv(
+                utils.get_mouse_csv_path(project, mouse),
+                sep=";",
+                usecols=["task", "date", "trial"],
+            )
+            sessions[(project, mouse)] = (
+                df.groupby(["task", "date"], as_index=False)["trial"]
+                .max()
+                .rename(columns={"trial": "trials"})
+            )
+    return sessions
+
+
+def start_server(port, data_root, cache_dir, log_file, gunicorn_workers, gunicorn_threads):
+    env = dict(os.environ)
+    env[utils.DATA_PATH_ENV] = str(data_root)
+    env[disk_cache.CACHE_DIR_ENV] = str(cache_dir)
+    if gunicorn_workers > 0:
+        command = [
+            sys.executable, "-m", "gunicorn",
+            f"--workers={gunicorn_workers}",
+            f"--threads={gunicorn_threads}",
+            f"--bind=127.0.0.1:{port}",
+            "behavior_data_visualizer.main:create_server()",
+        ]
+    else:
+        # the threaded development server of app.run
+        command = [sys.executable, "-m", "behavior_data_visualizer.main", f"--port={port}"]
+    return subprocess.Popen(command, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_for_server(base_url, process, timeout_s=120):
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("the server exited, see its log")
+        try:
+            response = requests.get(base_url + "/_dash-dependencies", timeout=5)
+            if response.status_code == 200:
+                return response.json()
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"the server did not start in {timeout_s} s")
+
+
+def run_level(base_url, dependencies, sessions, pid, n_users, duration_s, think_s, poll_s):
+    users = [
+        SimulatedUser(base_url, dependencies, sessions, think_s, poll_s, seed=i)
+        for i in range(n_users)
+    ]
+    rss = []
+    done = threading.Event()
+
+    def sample_rss():
+        start = time.perf_counter()
+        while not done.is_set():
+            rss.append((time.perf_counter() - start, get_tree_rss(pid)))
+            done.wait(1)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    deadline = start + duration_s
+    threads = [threading.Thread(target=user.run, args=(deadline,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for user in users:
+        for name in STEPS:
+            latencies[name] += user.latencies[name]
+            errors[name] += user.errors[name]
+    return {
+        "users": n_users,
+        "seconds": seconds,
+        "requests": sum(user.requests for user in users),
+        "steps": {
+            name: {
+                "count": len(latencies[name]),
+                "errors": errors[name],
+                "percentiles_ms": get_percentiles(latencies[name]),
+            }
+            for name in STEPS
+        },
+        "rss": rss,
+    }
+
+
+def print_level(result):
+    seconds = result["seconds"]
+    n_steps = sum(step["count"] for step in result["steps"].values())
+    print(
+        f"\n{result['users']} users: {result['requests'] / seconds:.1f} requests/s, "
+        f"{n_steps / seconds:.1f} steps/s"
+    )
+    print(f"  {'step':10s} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, step in result["steps"].items():
+        p50, p95, p99 = step["percentiles_ms"]
+        print(
+            f"  {name:10s} {step['count']:6d} {step['errors']:6d} "
+            f"{p50:9.1f} {p95:9.1f} {p99:9.1f}"
+        )
+    rss = [value for _, value in result["rss"] if value is not None]
+    if rss:
+        print(
+            f"  server rss: {rss[0] / 1024**2:.0f} MB at the start, "
+            f"{max(rss) / 1024**2:.0f} MB at most, {rss[-1] / 1024**2:.0f} MB at the end"
+        )
+
+
+def main(
+    users=(1, 4, 16),
+    duration_s=60,
+    think_ms=500,
+    poll_ms=300,
+    n_projects=2,
+    n_mice=8,
+    n_days=120,
+    trials_per_day=600,
+    gunicorn_workers=0,
+    gunicorn_threads=4,
+    output=None,
+):
+    # users: number of concurrent users of each level, run one after the other
+    # output: json file with the results and the rss sampled every second
+    if isinstance(users, int):
+        users = [users]
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = os.path.join(tmp, "data")
+        synthetic.write_data_root(
+            data_root,
+            n_projects=n_projects,
+            n_mice=n_mice,
+            n_days=n_days,
+            trials_per_day=trials_per_day,
+            sessions_per_day=2,
+            videos=True,
+            video_bytes=16 * 1024**2,
+        )
+        utils.set_data_path(data_root)
+        sessions = get_sessions()
+
+        port = get_free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        log_path = os.path.join(tmp, "server.log")
+        with open(log_path, "w") as log_file:
+            process = start_server(
+                port, data_root, os.path.join(tmp, "cache"), log_file,
+                gunicorn_workers, gunicorn_threads,
+            )
+            try:
+                dependencies = wait_for_server(base_url, process)
+                results = []
+                for n_users in users:
+                    result = run_level(
+                        base_url, dependencies, sessions, process.pid, n_users,
+                        duration_s, think_ms / 1000, poll_ms / 1000,
+                    )
+                    print_level(result)
+                    results.append(result)
+            except Exception:
+                with open(log_path) as f:
+                    print(f.read()[-5000:])
+                raise
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,57 @@
+# compare loading a mouse from the csv, from the feather cache and from
+# the memory mapped feather cache
+# usage: python benchmarks/benchmark_loading.py --n_days=365 --trials_per_day=800
+import tempfile
+import time
+from pathlib import Path
+
+import fire
+
+from behavior_data_visualizer import disk_cache, synthetic, utils
+
+
+def time_it(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(n_days=365, trials_per_day=800, repeats=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = synthetic.write_mouse_csv(
+            tmp, "project", "mouse", n_days=n_days, trials_per_day=trials_per_day
+        )
+        cache_dir = Path(tmp) / "cache"
+        stamp = disk_cache.get_csv_stamp(csv_path)
+        df = utils.read_mouse_csv(csv_path)
+        disk_cache.write_cached(df, csv_path, stamp, cache_dir=cache_dir)
+        data_path, _ = disk_cache.get_cache_paths(csv_path, cache_dir)
+
+        print(f"{len(df)} trials")
+        print(f"csv size:     {csv_path.stat().st_size / 1e6:.1f} MB")
+        print(f"feather size: {data_path.stat().st_size / 1e6:.1f} MB")
+        results = {
+            "cold csv": time_it(lambda: utils.read_mouse_csv(csv_path), repeats),
+            "warm feather": time_it(
+                lambda: disk_cache.read_cached(
+                    csv_path, stamp, cache_dir=cache_dir
+                ),
+                repeats,
+            ),
+            "memory mapped feather": time_it(
+                lambda: disk_cache.read_cached(
+                    csv_path, stamp, cache_dir=cache_dir, memory_map=True
+                ),
+                repeats,
+            ),
+        }
+        for name, seconds in results.items():
+            speedup = results["cold csv"] / seconds
+            print(f"{name:<22} {seconds * 1000:8.1f} ms  ({speedup:.1f}x)")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,51 @@
+# compare the memory of a mouse parsed with the inferred dtypes of
+# pd.read_csv and with the declared schema
+# usage: python benchmarks/benchmark_memory.py --n_days=365 --trials_per_day=800
+import tempfile
+import time
+
+import fire
+from lecilab_behavior_analysis import df_transforms as dft
+
+from behavior_data_visualizer import synthetic, utils
+from behavior_data_visualizer.loader import MouseDataLoader
+
+
+def main(n_days=365, trials_per_day=800):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = synthetic.write_mouse_csv(
+            tmp, "project", "mouse", n_days=n_days, trials_per_day=trials_per_day
+        )
+        start = time.perf_counter()
+        inferred = utils.read_mouse_csv(csv_path)
+        inferred_time = time.perf_counter() - start
+        start = time.perf_counter()
+        compact = MouseDataLoader(
+            csv_path, transform=dft.add_day_column_to_df, use_cache=False
+        ).load()
+        compact_time = time.perf_counter() - start
+
+    inferred_usage = inferred.memory_usage(deep=True)
+    compact_usage = compact.memory_usage(deep=True)
+    print(f"{len(inferred)} trials")
+    print(f"{'column':<24} {'inferred':>16} {'schema':>16}")
+    for column in inferred.columns:
+        # columns dropped by the schema take no memory
+        compact_dtype = compact[column].dtype if column in compact else "-"
+        print(
+            f"{column:<24} {str(inferred[column].dtype):>8} "
+            f"{inferred_usage[column] / 1e6:6.1f} MB "
+            f"{str(compact_dtype):>8} "
+            f"{compact_usage.get(column, 0) / 1e6:6.1f} MB"
+        )
+    total_inferred = inferred_usage.sum()
+    total_compact = compact_usage.sum()
+    print(
+        f"total: {total_inferred / 1e6:.1f} MB -> {total_compact / 1e6:.1f} MB "
+        f"({total_inferred / total_compact:.1f}x smaller)"
+    )
+    print(f"parse time: {inferred_time:.2f} s -> {compact_time:.2f} s")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,42 @@
+# time loading all the mice of synthetic projects of different sizes with
+# a different number of worker processes
+# usage: python benchmarks/benchmark_project_loading.py --n_mice="[10,50,200]"
+import os
+import tempfile
+import time
+
+import fire
+
+from behavior_data_visualizer import synthetic, utils
+
+
+def main(
+    n_mice=(10, 50, 200),
+    workers=(1, 2, 4, 8),
+    n_days=60,
+    trials_per_day=500,
+):
+    workers = [w for w in workers if w <= (os.cpu_count() or 1)]
+    print(f"{'mice':>6} " + " ".join(f"{w:>7}w" for w in workers))
+    for n in n_mice:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_paths = synthetic.write_project(
+                tmp, "project", n_mice=n, n_days=n_days,
+                trials_per_day=trials_per_day,
+            )
+            times = []
+            for max_workers in workers:
+                start = time.perf_counter()
+                # the feather cache is not used, to time the csv parsing
+                for _ in utils.iter_mouse_csv_paths(
+                    csv_paths, max_workers=max_workers, use_cache=False
+                ):
+                    pass
+                times.append(time.perf_counter() - start)
+        speedups = " ".join(f"{times[0] / t:7.1f}x" for t in times)
+        print(f"{n:>6} " + " ".join(f"{t:7.1f}s" for t in times))
+        print(f"{'':>6} {speedups}")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,72 @@
+# build the session and date dictionaries of a mouse with 500 sessions:
+# a filter per session against a single pass, and from the loader once
+# they are computed
+# usage: python benchmarks/benchmark_session_dicts.py --n_sessions=500
+import tempfile
+import time
+
+import fire
+
+from behavior_data_visualizer import synthetic, utils
+from behavior_data_visualizer.loader import MouseDataLoader
+
+
+def get_sessions_with_loop(df):
+    # the previous implementation
+    sessions_dict = {}
+    for session in df["session"].unique():
+        date = df[df["session"] == session]["date"].unique()[0]
+        sessions_dict[str(date) + " - Session: " + str(session)] = session
+    return sessions_dict
+
+
+def time_it(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def add_day_column(df):
+    return df.assign(year_month_day=df["date"].str[:10])
+
+
+def main(n_sessions=500, trials_per_session=300, repeats=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = synthetic.write_mouse_csv(
+            tmp,
+            "project",
+            "mouse",
+            n_days=n_sessions // 2,
+            trials_per_day=2 * trials_per_session,
+            sessions_per_day=2,
+        )
+        loader = MouseDataLoader(csv_path, transform=add_day_column, use_cache=False)
+        loader.load()
+    df = loader.df
+    loader.get_derived("sessions_dict", utils.get_dicctionary_of_sessions)
+
+    print(f"{df['session'].nunique()} sessions, {len(df)} trials")
+    results = {
+        "loop over sessions": time_it(lambda: get_sessions_with_loop(df), repeats),
+        "single pass": time_it(
+            lambda: utils.get_dicctionary_of_sessions(df), repeats
+        ),
+        "from the loader": time_it(
+            lambda: loader.get_derived(
+                "sessions_dict", utils.get_dicctionary_of_sessions
+            ),
+            repeats,
+        ),
+        "dates, single pass": time_it(
+            lambda: utils.get_diccionary_of_dates(df), repeats
+        ),
+    }
+    for name, seconds in results.items():
+        print(f"{name:20s} {seconds * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,55 @@
+# time seeking to a late trial of a 1 hour video: a range request for the
+# bytes around the trial against downloading the file up to that point
+# usage: python benchmarks/benchmark_video_seek.py --bitrate_mbps=2
+import tempfile
+import time
+from pathlib import Path
+
+import fire
+import flask
+
+from behavior_data_visualizer import video
+
+
+def main(duration_s=3600, bitrate_mbps=2.0, seek_s=3300, chunk_mb=1, repeats=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        # sparse file with the size of the video
+        video_path = Path(tmp) / "mouse_task_20240101_100000.mp4"
+        size = int(duration_s * bitrate_mbps * 1e6 / 8)
+        with open(video_path, "wb") as f:
+            f.truncate(size)
+        index = video.VideoIndex(lambda *args: str(video_path))
+        server = flask.Flask(__name__)
+        video.register_video_route(server, index)
+        client = server.test_client()
+        url = video.get_video_url("project", "mouse", "task", "2024-01-01")
+
+        start_byte = int(size * seek_s / duration_s)
+        end_byte = start_byte + int(chunk_mb * 1e6) - 1
+        range_times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            with client.get(
+                url, headers={"Range": f"bytes={start_byte}-{end_byte}"}
+            ) as response:
+                assert response.status_code == 206
+                response.get_data()
+            range_times.append(time.perf_counter() - start)
+
+        # without range support the browser reads up to the trial
+        start = time.perf_counter()
+        with client.get(url, buffered=False) as response:
+            read = 0
+            for chunk in response.response:
+                read += len(chunk)
+                if read >= start_byte:
+                    break
+        full_time = time.perf_counter() - start
+
+    print(f"video: {size / 1e6:.0f} MB, seek to {seek_s} s")
+    print(f"range request: {min(range_times) * 1000:8.1f} ms")
+    print(f"sequential:    {full_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,81 @@
+# fixtures of the pytest-benchmark suite, on a synthetic data root
+# usage: pytest benchmarks --benchmark-autosave
+# the size of the data can be changed with BDV_BENCHMARK_MICE, _DAYS and _TRIALS
+import os
+import tracemalloc
+
+import pytest
+
+from behavior_data_visualizer import disk_cache, synthetic, utils
+
+PROJECT = "project00"
+MOUSE = "mouse000"
+
+
+def get_size(name, default):
+    return int(os.environ.get(f"BDV_BENCHMARK_{name}", default))
+
+
+@pytest.fixture(scope="session")
+def data_root(tmp_path_factory):
+    root = tmp_path_factory.mktemp("data")
+    synthetic.write_data_root(
+        root,
+        n_projects=2,
+        n_mice=get_size("MICE", 4),
+        n_days=get_size("DAYS", 120),
+        trials_per_day=get_size("TRIALS", 600),
+        sessions_per_day=2,
+        videos=True,
+    )
+    return root
+
+
+@pytest.fixture(scope="session", autouse=True)
+def use_data_root(data_root, tmp_path_factory):
+    # point the app at the synthetic data and a fresh cache directory
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(utils.DATA_PATH_ENV, str(data_root))
+        monkeypatch.setenv(
+            disk_cache.CACHE_DIR_ENV, str(tmp_path_factory.mktemp("cache"))
+        )
+        utils.get_data_path.cache_clear()
+        yield
+    utils.get_data_path.cache_clear()
+
+
+@pytest.fixture(scope="session")
+def csv_path(data_root):
+    return utils.get_mouse_csv_path(PROJECT, MOUSE)
+
+
+@pytest.fixture(scope="session")
+def loader():
+    return utils.get_loaded_mouse(PROJECT, MOUSE)
+
+
+@pytest.fixture(scope="session")
+def day(loader):
+    # a day in the middle of the training
+    days = loader.day_index.days
+    return str(days[len(days) // 2])
+
+
+@pytest.fixture
+def record_memory(benchmark):
+    # peak python memory of one call, stored with the timings
+    def record(function, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            result = function(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_memory_mb"] = peak / 1024**2
+        return result
+
+    return record
+
+
+def get_click_data(day):
+    return {"points": [{"customdata": [day]}]}
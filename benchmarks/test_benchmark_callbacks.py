@@ -0,0 +1,100 @@
+# latency and peak memory of each callback of the app, called as dash
+# calls them, on the synthetic data root
+import pytest
+from conftest import MOUSE, PROJECT, get_click_data
+
+from behavior_data_visualizer import day_view, main, utils
+
+
+@pytest.fixture(scope="module")
+def app():
+    app = main.app_builder(report_workers=1)
+    yield app
+    main.report_renderer.shutdown()
+    main.load_jobs.shutdown()
+    main.mouse_prefetcher.shutdown()
+
+
+def get_callback(app, name):
+    # the function registered with app.callback, clientside ones have none
+    for callback in app.callback_map.values():
+        if "callback" not in callback:
+            continue
+        function = callback["callback"].__wrapped__
+        if function.__name__ == name:
+            return function
+    raise KeyError(name)
+
+
+@pytest.fixture(scope="module")
+def loaded(app):
+    loader = main.mouse_prefetcher.get(PROJECT, MOUSE)
+    return loader, {"mouse": MOUSE, "stamp": loader.stamp}
+
+
+def test_update_mice_options(benchmark, app):
+    callback = get_callback(app, "update_mice_options")
+    assert len(benchmark(callback, PROJECT, "benchmark")) > 0
+
+
+def test_update_mouse_data_loaded(benchmark, app, loaded):
+    # the mouse is in the cache, only the end of its csv is checked
+    callback = get_callback(app, "update_mouse_data")
+    data, _, _ = benchmark(callback, PROJECT, MOUSE, 1, None, None, "benchmark")
+    assert data["mouse"] == MOUSE
+
+
+@pytest.mark.parametrize("metric", ["trials", "performance"])
+def test_update_calendar(benchmark, record_memory, app, loaded, metric):
+    callback = get_callback(app, "update_calendar")
+    record_memory(callback, loaded[1], metric, MOUSE, PROJECT)
+    benchmark(callback, loaded[1], metric, MOUSE, PROJECT)
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_update_single_mouse_reactive(benchmark, record_memory, app, loaded, day, cached):
+    callback = get_callback(app, "update_single_mouse_reactive")
+    loader, data = loaded
+    args = (get_click_data(day), data, MOUSE, PROJECT)
+
+    def clear():
+        if not cached:
+            main.figure_cache.invalidate(PROJECT, MOUSE)
+            loader._derived.pop("day_views", None)
+        return args, {}
+
+    clear()
+    record_memory(callback, *args)
+    day_view.stats.clear()
+    benchmark.pedantic(callback, setup=clear, rounds=10)
+    benchmark.extra_info["day_views"] = day_view.stats["views"]
+
+
+def test_update_single_mouse_video(benchmark, app, loaded):
+    callback = get_callback(app, "update_single_mouse_video")
+    df = loaded[0].df
+    row = df.iloc[len(df) // 2]
+    click_data = {
+        "points": [
+            {"customdata": [MOUSE, row["task"], str(row["date"]), int(row["trial"])]}
+        ]
+    }
+    _, start = benchmark(callback, click_data, PROJECT)
+    assert start["time"] >= 0
+
+
+@pytest.mark.parametrize("metric", ["daily", "curve"])
+def test_compare_mice(benchmark, record_memory, app, loaded, metric):
+    callback = get_callback(app, "update_figure")
+    mice = get_callback(app, "update_checklist_options")(PROJECT)[0]
+    mice = [option["value"] for option in mice]
+    # the summaries of all the mice, as the sweep of the project leaves them
+    utils.update_project_aggregates(PROJECT, main.aggregate_store)
+    record_memory(callback, mice, metric, None, PROJECT)
+    figure, status, _ = benchmark(callback, mice, metric, None, PROJECT)
+    assert status == ""
+
+
+def test_update_session_dropdown(benchmark, app, loaded):
+    callback = get_callback(app, "update_session_dropdown")
+    assert len(benchmark(callback, MOUSE, PROJECT)) > 0
@@ -0,0 +1,129 @@
+# latency and peak memory of the functions of utils and derived
+import pytest
+from conftest import MOUSE, PROJECT, get_click_data
+
+from behavior_data_visualizer import aggregates, derived, disk_cache, utils
+from behavior_data_visualizer.loader import MouseDataLoader
+
+
+def run(benchmark, record_memory, function, *args, **kwargs):
+    record_memory(function, *args, **kwargs)
+    return benchmark(function, *args, **kwargs)
+
+
+def test_read_mouse_csv(benchmark, record_memory, csv_path):
+    run(benchmark, record_memory, utils.read_mouse_csv, csv_path)
+
+
+def test_load_mouse_from_csv(benchmark, record_memory, csv_path):
+    def load():
+        disk_cache.clear_cached(csv_path)
+        return utils.get_loaded_mouse(PROJECT, MOUSE)
+
+    run(benchmark, record_memory, load)
+
+
+def test_load_mouse_from_cache(benchmark, record_memory, loader):
+    run(benchmark, record_memory, utils.get_loaded_mouse, PROJECT, MOUSE)
+
+
+def test_refresh_unchanged_mouse(benchmark, loader):
+    assert benchmark(loader.refresh) == 0
+
+
+def test_iter_project_mice(benchmark, record_memory):
+    def load_project():
+        return list(utils.iter_project_mice(PROJECT, max_workers=2))
+
+    run(benchmark, record_memory, load_project)
+
+
+def test_list_projects_and_mice(benchmark):
+    def list_all():
+        return [
+            utils.get_list_of_mice(project_name)
+            for project_name in utils.get_list_of_projects()
+        ]
+
+    benchmark(list_all)
+
+
+def test_sort_mice_by_activity(benchmark):
+    mice = utils.get_list_of_mice(PROJECT)
+    benchmark(utils.sort_mice_by_activity, PROJECT, mice)
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_get_day_df(benchmark, loader, day, indexed):
+    day_index = loader.day_index if indexed else None
+    benchmark(utils.get_day_df, loader.df, day, day_index)
+
+
+def test_display_click_data(benchmark, record_memory, loader, day):
+    run(
+        benchmark, record_memory, utils.display_click_data,
+        get_click_data(day), loader.df, loader.day_index,
+    )
+
+
+def test_update_performance_figure(benchmark, record_memory, loader, day):
+    run(
+        benchmark, record_memory, utils.update_performance_figure,
+        get_click_data(day), loader.df, loader.day_index,
+    )
+
+
+def test_update_psychometric_figure(benchmark, record_memory, loader, day):
+    run(
+        benchmark, record_memory, utils.update_psychometric_figure,
+        get_click_data(day), loader.df, loader.day_index,
+    )
+
+
+def test_get_day_summaries(benchmark, record_memory, loader):
+    run(benchmark, record_memory, derived.get_day_summaries, loader.df)
+
+
+def test_update_day_summaries(benchmark, loader):
+    # the last day of trials appended, summarised again with the new ones
+    first_row = loader.n_rows - 300
+    summaries = derived.get_day_summaries(loader.df.iloc[:first_row])
+    benchmark(derived.update_day_summaries, summaries, loader.df, first_row)
+
+
+def test_get_seconds_of_trial(benchmark, loader):
+    date = str(loader.df["date"].iloc[-1])
+    trial = int(loader.df["trial"].iloc[-1])
+    benchmark(utils.get_seconds_of_trial, loader.df, date, trial)
+
+
+def test_compute_mouse_aggregates(benchmark, record_memory, loader):
+    run(benchmark, record_memory, utils.compute_mouse_aggregates, loader.df)
+
+
+def test_get_mouse_aggregates_from_store(benchmark, loader, tmp_path):
+    store = aggregates.AggregateStore(tmp_path)
+    utils.update_aggregates(PROJECT, MOUSE, loader, store)
+    assert benchmark(utils.get_mouse_aggregates, PROJECT, MOUSE, store) is not None
+
+
+def test_get_video_path(benchmark, loader):
+    date = str(loader.df["date"].iloc[0])
+    benchmark(utils.get_video_path, PROJECT, MOUSE, "TwoAFC", date)
+
+
+def test_parse_appended_trials(benchmark, csv_path, tmp_path):
+    # a day of trials appended to the csv, parsed by refresh
+    lines = csv_path.read_text().splitlines(keepends=True)
+    head, tail = lines[:-600], lines[-600:]
+
+    def setup():
+        path = tmp_path / csv_path.name
+        path.write_text("".join(head))
+        loader = MouseDataLoader(path, use_cache=False)
+        loader.load()
+        with open(path, "a") as f:
+            f.write("".join(tail))
+        return (loader,), {}
+
+    benchmark.pedantic(lambda loader: loader.refresh(), setup=setup, rounds=5)
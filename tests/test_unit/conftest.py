@@ -0,0 +1,73 @@
+import sys
+import types
+
+import pytest
+
+
+class FigureStub:
+    def savefig(self, path, format=None):
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+
+
+def add_day_column_to_df(df):
+    df["year_month_day"] = df["date"].astype(str).str[:10]
+    return df
+
+
+def get_performance_through_trials(df, window=50):
+    return df.assign(
+        total_trial=range(1, len(df) + 1),
+        performance_w=df["correct"].astype(float).rolling(window, min_periods=1).mean()
+        * 100,
+    )
+
+
+def get_performance_by_difficulty(df):
+    left = (df["first_trial_response"] == "left").groupby(df["leftward_evidence"])
+    return left.mean().rename("leftward_choices").reset_index()
+
+
+@pytest.fixture
+def analysis_stub(monkeypatch):
+    # the analysis package and matplotlib are not dependencies of the app,
+    # these stand in for the few functions it calls. Returns the calls made
+    calls = []
+
+    def record(name, function):
+        def wrapper(*args, **kwargs):
+            calls.append(name)
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    package = types.ModuleType("lecilab_behavior_analysis")
+    dft = types.ModuleType("lecilab_behavior_analysis.df_transforms")
+    dft.add_day_column_to_df = add_day_column_to_df
+    dft.get_performance_through_trials = record(
+        "performance", get_performance_through_trials
+    )
+    dft.get_performance_by_difficulty = record(
+        "psychometric", get_performance_by_difficulty
+    )
+    fm = types.ModuleType("lecilab_behavior_analysis.figure_maker")
+    fm.subject_progress_figure = record("progress", lambda df: FigureStub())
+    fm.session_summary_figure = record(
+        "session", lambda df, mouse_name, perf_window: FigureStub()
+    )
+    package.df_transforms = dft
+    package.figure_maker = fm
+    matplotlib = types.ModuleType("matplotlib")
+    matplotlib.use = lambda backend: None
+    pyplot = types.ModuleType("matplotlib.pyplot")
+    pyplot.close = lambda fig: None
+    matplotlib.pyplot = pyplot
+    for name, module in [
+        ("lecilab_behavior_analysis", package),
+        ("lecilab_behavior_analysis.df_transforms", dft),
+        ("lecilab_behavior_analysis.figure_maker", fm),
+        ("matplotlib", matplotlib),
+        ("matplotlib.pyplot", pyplot),
+    ]:
+        monkeypatch.setitem(sys.modules, name, module)
+    return calls
@@ -0,0 +1,67 @@
+import numpy as np
+
+from behavior_data_visualizer import aggregates, disk_cache, synthetic, utils
+
+
+def make_perf_df():
+    df = synthetic.make_mouse_df("mouse", n_days=3, trials_per_day=120)
+    df["year_month_day"] = df["date"].str[:10]
+    df["total_trial"] = np.arange(len(df))
+    df["performance_w"] = df["correct"].rolling(50).mean() * 100
+    return df
+
+
+def test_daily_and_curve(tmp_path):
+    perf_df = make_perf_df()
+    daily = aggregates.compute_daily(perf_df)
+    assert daily["trials"].tolist() == [120, 120, 120]
+    assert daily["sessions"].tolist() == [1, 1, 1]
+    first_day = perf_df.iloc[:120]
+    assert np.isclose(
+        daily["performance"].iloc[0], first_day["correct"].mean() * 100
+    )
+    curve = aggregates.compute_curve(perf_df)
+    assert curve["total_trial"].tolist() == [50, 100, 150, 200, 250, 300, 350]
+    assert curve["performance_w"].iloc[0] == perf_df["performance_w"].iloc[49]
+
+    store = aggregates.AggregateStore(tmp_path)
+    assert store.read("project", "mouse") is None
+    store.write("project", "mouse", daily, curve, {"stamp": "1-a", "size": 1})
+    stored_daily, stored_curve = store.read("project", "mouse")
+    assert stored_daily["trials"].tolist() == [120, 120, 120]
+    assert len(stored_curve) == 7
+    assert store.read_stamp("project", "mouse")["stamp"] == "1-a"
+
+
+def test_project_sweep(tmp_path, monkeypatch, analysis_stub):
+    data_root = tmp_path / "data"
+    synthetic.write_data_root(data_root, n_mice=2, n_days=2, trials_per_day=60)
+    monkeypatch.setenv(utils.DATA_PATH_ENV, str(data_root))
+    monkeypatch.setenv(disk_cache.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    utils.get_data_path.cache_clear()
+    store = aggregates.AggregateStore(tmp_path / "aggregates")
+    try:
+        # the trials of a mouse that was never summarised are not loaded
+        assert utils.get_mouse_aggregates("project00", "mouse000", store) is None
+        assert analysis_stub == []
+        assert utils.update_project_aggregates("project00", store) == [
+            "mouse000",
+            "mouse001",
+        ]
+        daily, _ = utils.get_mouse_aggregates("project00", "mouse000", store)
+        assert daily["trials"].tolist() == [60, 60]
+        assert utils.update_project_aggregates("project00", store) == []
+        # a line still being written is not in the summary, nor in the data
+        csv_path = utils.get_mouse_csv_path("project00", "mouse000")
+        with open(csv_path, "a") as f:
+            f.write("mouse000;")
+        assert utils.get_mouse_aggregates("project00", "mouse000", store) is not None
+        assert utils.update_project_aggregates("project00", store) == []
+        # a mouse with new trials is summarised again
+        synthetic.write_mouse_csv(
+            data_root, "project00", "mouse001", n_days=3, trials_per_day=60
+        )
+        assert utils.get_mouse_aggregates("project00", "mouse001", store) is None
+        assert utils.update_project_aggregates("project00", store) == ["mouse001"]
+    finally:
+        utils.get_data_path.cache_clear()
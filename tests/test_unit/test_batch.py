@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from behavior_data_visualizer import batch, disk_cache, synthetic, utils
+
+
+def test_day_hash_changes_with_the_trials():
+    df = synthetic.make_mouse_df("mouse", n_days=1, trials_per_day=50)
+    day_hash = batch.get_day_hash(df)
+    assert batch.get_day_hash(df.copy()) == day_hash
+    df.loc[10, "correct"] = not df.loc[10, "correct"]
+    assert batch.get_day_hash(df) != day_hash
+
+
+def test_stale_sessions_and_manifest(tmp_path):
+    (tmp_path / "2024-01-01.png").write_bytes(b"")
+    (tmp_path / "2024-01-02.png").write_bytes(b"")
+    manifest = {"sessions": {"2024-01-01": "a", "2024-01-02": "b"}}
+    day_hashes = {"2024-01-01": "a", "2024-01-02": "c", "2024-01-03": "d"}
+    stale = batch.get_stale_sessions(day_hashes, manifest, tmp_path)
+    assert stale == ["2024-01-02", "2024-01-03"]
+
+    path = batch.get_manifest_path(tmp_path, "project", "mouse")
+    assert batch.read_manifest(path) == {}
+    batch.write_manifest(manifest, path)
+    assert batch.read_manifest(path) == manifest
+    assert batch.count_reports({"progress": "x", **manifest}) == 3
+
+
+def test_appended_trials_are_rendered_again(tmp_path, monkeypatch, analysis_stub):
+    df = synthetic.make_mouse_df("mouse000", n_days=3, trials_per_day=20)
+    data_root = tmp_path / "data"
+    csv_path = synthetic.write_mouse_csv(
+        data_root, "project", "mouse000", n_days=2, trials_per_day=20
+    )
+    monkeypatch.setenv(utils.DATA_PATH_ENV, str(data_root))
+    monkeypatch.setenv(disk_cache.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    utils.get_data_path.cache_clear()
+    output_dir = tmp_path / "reports"
+
+    def generate():
+        executor = ThreadPoolExecutor(max_workers=1)
+        return batch.generate_reports(output_dir, executor=executor)
+
+    try:
+        assert generate()["rendered"] == 3
+        assert generate()["rendered"] == 0
+        # a third day of trials
+        with open(csv_path, "a") as f:
+            f.write(df.iloc[40:].to_csv(sep=";", index=False, header=False))
+        result = generate()
+    finally:
+        utils.get_data_path.cache_clear()
+    # the progress and the new session
+    assert result["rendered"] == 2
+    assert result["skipped"] == 2
+    assert (output_dir / "project" / "mouse000" / "sessions" / "2024-01-03.png").is_file()
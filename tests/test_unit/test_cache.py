@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from behavior_data_visualizer import synthetic
+from behavior_data_visualizer.cache import MouseDataCache, get_loader_size
+
+
+def make_loader(mouse_name):
+    df = synthetic.make_mouse_df(mouse_name, n_days=1, trials_per_day=100)
+    return SimpleNamespace(df=df)
+
+
+def test_least_recently_used_mouse_is_evicted():
+    size = get_loader_size(make_loader("a"))
+    cache = MouseDataCache(max_bytes=int(size * 2.5))
+    cache.put("project", "a", make_loader("a"))
+    cache.put("project", "b", make_loader("b"))
+    assert cache.get("project", "a") is not None
+    cache.put("project", "c", make_loader("c"))
+    assert ("project", "b") not in cache
+    assert ("project", "a") in cache
+    assert cache.get("project", "b") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_invalidate():
+    cache = MouseDataCache()
+    for key in [("project1", "a"), ("project1", "b"), ("project2", "a")]:
+        cache.put(*key, make_loader(key[1]))
+    cache.invalidate("project1", "a")
+    assert cache.keys() == [("project1", "b"), ("project2", "a")]
+    cache.invalidate("project1")
+    assert cache.keys() == [("project2", "a")]
+    cache.invalidate()
+    assert len(cache) == 0
@@ -0,0 +1,35 @@
+from behavior_data_visualizer import synthetic
+from behavior_data_visualizer.catalog import DataCatalog
+
+
+def test_catalog_lists_and_refreshes(tmp_path):
+    synthetic.write_project(tmp_path, "project", n_mice=2, n_days=1)
+    video_path = tmp_path / "project" / "videos" / "mouse000" / "video.mp4"
+    video_path.parent.mkdir(parents=True)
+    video_path.touch()
+    catalog = DataCatalog(tmp_path)
+    catalog.refresh()
+    assert catalog.get_projects() == ["project"]
+    assert catalog.get_mice("project") == ["mouse000", "mouse001"]
+    assert catalog.get_csv_stat("project", "mouse000")[0] > 0
+    assert catalog.video_exists(str(video_path))
+    assert not catalog.video_exists(str(video_path.with_name("other.mp4")))
+
+    synthetic.write_mouse_csv(tmp_path, "project", "mouse002", n_days=1)
+    catalog.refresh()
+    assert catalog.get_mice("project") == ["mouse000", "mouse001", "mouse002"]
+    assert catalog.scans == 2
+
+
+def test_removed_and_truncated_csv_are_reported(tmp_path):
+    synthetic.write_project(tmp_path, "project", n_mice=3, n_days=2)
+    catalog = DataCatalog(tmp_path)
+    reported = []
+    catalog.add_listener(reported.extend)
+    catalog.refresh()
+    assert reported == []
+    synthetic.write_mouse_csv(tmp_path, "project", "mouse000", n_days=3)
+    synthetic.write_mouse_csv(tmp_path, "project", "mouse001", n_days=1)
+    (tmp_path / "project" / "sessions" / "mouse002" / "mouse002.csv").unlink()
+    catalog.refresh()
+    assert reported == [("project", "mouse001"), ("project", "mouse002")]
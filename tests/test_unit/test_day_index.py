@@ -0,0 +1,40 @@
+import pandas as pd
+
+from behavior_data_visualizer import synthetic
+from behavior_data_visualizer.day_index import DayIndex, sort_by_day
+
+
+def make_df(n_days=3, trials_per_day=20):
+    df = synthetic.make_mouse_df(
+        "mouse", n_days=n_days, trials_per_day=trials_per_day
+    )
+    df["year_month_day"] = df["date"].str[:10]
+    return df
+
+
+def test_day_slices_match_boolean_filter():
+    df = make_df()
+    day_index = DayIndex(df)
+    for day in df["year_month_day"].unique():
+        pd.testing.assert_frame_equal(
+            day_index.get_day(df, day), df[df["year_month_day"] == day]
+        )
+    assert day_index.get_day(df, "1999-01-01").empty
+    assert day_index.counts.tolist() == [20, 20, 20]
+
+
+def test_extend_with_appended_rows():
+    df = make_df()
+    day_index = DayIndex(df.iloc[:50])
+    tail = df.iloc[50:]
+    assert day_index.can_extend(tail)
+    day_index.extend(tail, 50)
+    assert day_index.starts == [0, 20, 40]
+    assert day_index.stops == [20, 40, 60]
+    assert not day_index.can_extend(df.iloc[:10])
+
+
+def test_sort_by_day():
+    df = make_df()
+    shuffled = pd.concat([df.iloc[40:], df.iloc[:40]], ignore_index=True)
+    assert sort_by_day(shuffled)["trial"].tolist() == df["trial"].tolist()
@@ -0,0 +1,32 @@
+from behavior_data_visualizer import day_view, synthetic
+from behavior_data_visualizer.loader import MouseDataLoader
+
+
+def test_one_computation_per_click(tmp_path, analysis_stub):
+    from lecilab_behavior_analysis import df_transforms as dft
+
+    df = synthetic.make_mouse_df("mouse", n_days=2, trials_per_day=100)
+    csv_path = tmp_path / "mouse.csv"
+    df.to_csv(csv_path, sep=";", index=False)
+    loader = MouseDataLoader(
+        csv_path, transform=dft.add_day_column_to_df, use_cache=False
+    )
+    loader.load()
+    date = loader.day_index.days[0]
+
+    day_view.stats.clear()
+    view = day_view.get_day_view(loader, date)
+    view.get_performance_figure()
+    view.get_psychometric_figure()
+    view.session_changes
+    assert day_view.get_day_view(loader, date) is view
+    assert day_view.stats["views"] == 1
+    assert day_view.stats["performance"] == 1
+    assert day_view.stats["psychometric"] == 1
+    assert analysis_stub == ["performance", "psychometric"]
+    assert len(view.df) == 100
+
+    # another window is another view of the same day
+    day_view.get_day_view(loader, date, window=20).get_performance_figure()
+    assert day_view.stats["views"] == 2
+    assert day_view.stats["performance"] == 2
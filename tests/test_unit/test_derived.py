@@ -0,0 +1,64 @@
+import pandas as pd
+
+from behavior_data_visualizer import derived, schema, synthetic
+from behavior_data_visualizer.loader import MouseDataLoader
+
+
+def add_day_column(df):
+    return df.assign(year_month_day=df["date"].astype(str).str[:10])
+
+
+def test_trial_offsets():
+    df = schema.compact_dtypes(
+        synthetic.make_mouse_df("mouse", n_days=2, trials_per_day=10)
+    )
+    offsets = derived.get_trial_offsets(df)
+    date = df["date"].iloc[15]
+    session = df[df["date"] == date]
+    expected = session["TRIAL_START"].iloc[4] - session["TRIAL_START"].iloc[0]
+    assert offsets.loc[(str(date), 5)] == expected
+    assert offsets.loc[(str(date), 1)] == 0
+
+
+def test_day_summaries():
+    df = schema.compact_dtypes(
+        add_day_column(
+            synthetic.make_mouse_df(
+                "mouse", n_days=2, trials_per_day=30, sessions_per_day=2
+            )
+        )
+    )
+    summaries = derived.get_day_summaries(df)
+    day = df[df["year_month_day"] == "2024-01-02"]
+    summary = summaries.loc["2024-01-02"]
+    assert summary["trials"] == 30
+    assert summary["sessions"] == 2
+    assert summary["performance"] == day["correct"].mean() * 100
+    text = derived.get_day_text(summaries, "2024-01-02")
+    assert "Trials: 30" in text
+    for modality, trials in day["stimulus_modality"].value_counts().items():
+        assert f"{modality}: {trials} trials" in text
+    assert derived.get_day_text(summaries, "2024-02-01") == "No trials on 2024-02-01"
+
+
+def test_day_summaries_are_updated_with_appended_trials(tmp_path):
+    df = synthetic.make_mouse_df("mouse", n_days=3, trials_per_day=20)
+    csv_path = tmp_path / "mouse.csv"
+    df.iloc[:30].to_csv(csv_path, sep=";", index=False)
+    loader = MouseDataLoader(csv_path, transform=add_day_column, use_cache=False)
+    loader.load()
+    updates = []
+
+    def update(summaries, df, first_row):
+        updates.append(first_row)
+        return derived.update_day_summaries(summaries, df, first_row)
+
+    loader.get_derived("summaries", derived.get_day_summaries, update)
+    # the second day is completed and a third one starts
+    with open(csv_path, "a") as f:
+        f.write(df.iloc[30:50].to_csv(sep=";", index=False, header=False))
+    loader.refresh()
+    summaries = loader.get_derived("summaries", derived.get_day_summaries, update)
+    assert updates == [30]
+    pd.testing.assert_frame_equal(summaries, derived.get_day_summaries(loader.df))
+    assert summaries["trials"].tolist() == [20, 20, 10]
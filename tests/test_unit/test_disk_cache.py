@@ -0,0 +1,34 @@
+import pytest
+
+from behavior_data_visualizer import disk_cache, synthetic
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    return synthetic.write_mouse_csv(
+        tmp_path, "project", "mouse", n_days=2, trials_per_day=10
+    )
+
+
+def test_cache_roundtrip(csv_path, tmp_path):
+    df = synthetic.make_mouse_df("mouse", n_days=2, trials_per_day=10)
+    stamp = disk_cache.get_csv_stamp(csv_path)
+    assert disk_cache.read_cached(csv_path, cache_dir=tmp_path) is None
+    assert disk_cache.write_cached(df, csv_path, stamp, cache_dir=tmp_path)
+    cached = disk_cache.read_cached(csv_path, cache_dir=tmp_path)
+    assert cached.equals(df)
+    mapped = disk_cache.read_cached(
+        csv_path, cache_dir=tmp_path, memory_map=True
+    )
+    assert mapped.equals(df)
+
+
+def test_cache_invalidated_when_csv_changes(csv_path, tmp_path):
+    df = synthetic.make_mouse_df("mouse", n_days=2, trials_per_day=10)
+    stamp = disk_cache.get_csv_stamp(csv_path)
+    disk_cache.write_cached(df, csv_path, stamp, cache_dir=tmp_path)
+    with open(csv_path, "a") as f:
+        f.write("extra line\n")
+    assert disk_cache.read_cached(csv_path, cache_dir=tmp_path) is None
@@ -0,0 +1,21 @@
+import numpy as np
+
+from behavior_data_visualizer.downsample import lttb_indices
+
+
+def test_lttb_keeps_ends_and_peaks():
+    x = np.arange(10000)
+    y = np.sin(x / 500)
+    y[5000] = 10
+    y[:20] = np.nan
+    indices = lttb_indices(x, y, 200)
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert np.all(np.diff(indices) > 0)
+    assert 5000 in indices
+
+
+def test_lttb_short_traces_are_not_downsampled():
+    assert lttb_indices(np.arange(10), np.arange(10), 100).tolist() == list(
+        range(10)
+    )
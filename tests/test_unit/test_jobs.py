@@ -0,0 +1,64 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from behavior_data_visualizer.jobs import MouseLoadJobs
+from behavior_data_visualizer.loader import LoadCancelled
+
+
+def test_switching_mouse_cancels_the_load():
+    started = threading.Event()
+
+    def load_function(project_name, mouse_name, progress):
+        if mouse_name == "slow":
+            started.set()
+            while True:
+                progress(1, 2)
+        return SimpleNamespace(name=mouse_name)
+
+    load_jobs = MouseLoadJobs(load_function)
+    slow = load_jobs.start("project", "slow", "page")
+    assert started.wait(5)
+    assert slow.progress.fraction == 0.5
+    fast = load_jobs.start("project", "fast", "page")
+    assert fast.result().name == "fast"
+    with pytest.raises(LoadCancelled):
+        slow.result()
+    # the job is kept until its result is taken
+    assert load_jobs.start("project", "fast", "page") is fast
+    load_jobs.finish("project", "fast", "page")
+    assert load_jobs.start("project", "fast", "page") is not fast
+    load_jobs.shutdown()
+
+
+def test_pages_do_not_cancel_each_other():
+    running = threading.Semaphore(0)
+    release = threading.Event()
+
+    def load_function(project_name, mouse_name, progress):
+        running.release()
+        while not release.is_set():
+            progress(1, 2)
+        progress(2, 2)
+        return SimpleNamespace(name=mouse_name)
+
+    load_jobs = MouseLoadJobs(load_function, max_workers=3)
+    first = load_jobs.start("project", "first", "page a")
+    second = load_jobs.start("project", "second", "page b")
+    shared = load_jobs.start("project", "shared", "page c")
+    for _ in range(3):
+        assert running.acquire(timeout=5)
+    # page a selects another mouse, the load page b waits for goes on
+    assert load_jobs.start("project", "shared", "page a") is shared
+    load_jobs.cancel("page d")
+    # page c selects another mouse, page a still waits for the shared one
+    load_jobs.cancel("page c")
+    release.set()
+    with pytest.raises(LoadCancelled):
+        first.result()
+    assert second.result().name == "second"
+    assert shared.result().name == "shared"
+    load_jobs.finish("project", "second", "page b")
+    load_jobs.finish("project", "shared", "page a")
+    load_jobs.shutdown()
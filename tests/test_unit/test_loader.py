@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from behavior_data_visualizer import disk_cache, synthetic
+from behavior_data_visualizer import loader as loader_module
+from behavior_data_visualizer.loader import LoadCancelled, MouseDataLoader
+
+
+def test_refresh_parses_only_appended_lines(tmp_path):
+    df = synthetic.make_mouse_df("mouse", n_days=3, trials_per_day=20)
+    csv_path = tmp_path / "mouse.csv"
+    df.iloc[:40].to_csv(csv_path, sep=";", index=False)
+    loader = MouseDataLoader(csv_path, use_cache=False)
+    loader.load()
+    assert loader.n_rows == 40
+    version = loader.version
+
+    # append the rest of the trials, with the last line still being written
+    lines = df.iloc[40:].to_csv(sep=";", index=False, header=False)
+    with open(csv_path, "a") as f:
+        f.write(lines[:-10])
+    assert loader.refresh() == 19
+    assert loader.version > version
+    with open(csv_path, "a") as f:
+        f.write(lines[-10:])
+    assert loader.refresh() == 1
+    assert loader.refresh() == 0
+    pd.testing.assert_frame_equal(
+        loader.df,
+        MouseDataLoader(csv_path, use_cache=False).load(),
+        check_categorical=False,
+    )
+
+
+def test_concurrent_refreshes_parse_the_tail_once(tmp_path):
+    df = synthetic.make_mouse_df("mouse", n_days=3, trials_per_day=100)
+    csv_path = tmp_path / "mouse.csv"
+    df.iloc[:250].to_csv(csv_path, sep=";", index=False)
+
+    def slow_transform(data):
+        # long enough for the other refresh to start meanwhile
+        data["year_month_day"] = data["date"].str[:10]
+        if len(data) < 100:
+            time.sleep(0.2)
+        return data
+
+    loader = MouseDataLoader(csv_path, transform=slow_transform, use_cache=False)
+    loader.load()
+    with open(csv_path, "a") as f:
+        f.write(df.iloc[250:].to_csv(sep=";", index=False, header=False))
+    threads = [threading.Thread(target=loader.refresh) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loader.n_rows == len(loader.df) == 300
+    assert loader.day_index.counts.tolist() == [100, 100, 100]
+    assert loader.day_index.get_slice(loader.day_index.days[-1]) == slice(200, 300)
+
+
+def test_rewritten_file_is_reloaded(tmp_path):
+    df = synthetic.make_mouse_df("mouse", n_days=2, trials_per_day=20)
+    csv_path = tmp_path / "mouse.csv"
+    df.to_csv(csv_path, sep=";", index=False)
+    loader = MouseDataLoader(csv_path, use_cache=False)
+    loader.load()
+    df.iloc[:10].to_csv(csv_path, sep=";", index=False)
+    loader.refresh()
+    assert loader.n_rows == 10
+
+
+def test_memory_mapped_cache_is_reused(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setenv(disk_cache.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    csv_path = synthetic.write_mouse_csv(
+        tmp_path, "project", "mouse", n_days=2, trials_per_day=20
+    )
+    first = MouseDataLoader(csv_path, memory_map=True)
+    first.load()
+    second = MouseDataLoader(csv_path, memory_map=True)
+    second.load()
+    assert second.stamp == first.stamp
+    pd.testing.assert_frame_equal(second.df, first.df)
+
+    # a loader started after new trials reads the cache and the tail only
+    df = synthetic.make_mouse_df("mouse", n_days=1, trials_per_day=5)
+    with open(csv_path, "a") as f:
+        f.write(df.to_csv(sep=";", index=False, header=False))
+    assert first.refresh() == 5
+    third = MouseDataLoader(csv_path, memory_map=True)
+    third.load()
+    assert third.n_rows == 45
+    assert third.stamp == first.stamp
+
+
+def test_cache_of_an_edited_csv_is_not_used(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setenv(disk_cache.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    csv_path = synthetic.write_mouse_csv(
+        tmp_path, "project", "mouse", n_days=3, trials_per_day=200
+    )
+    MouseDataLoader(csv_path).load()
+
+    def edit_first_trial(old, new):
+        # same size, far from the end of the file
+        text = csv_path.read_text()
+        csv_path.write_text(text.replace(old, new, 1))
+        stat = csv_path.stat()
+        os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    edit_first_trial("TwoAFC", "TwoAFD")
+    assert MouseDataLoader(csv_path).load()["task"].iloc[0] == "TwoAFD"
+
+    # edited and appended to since it was cached
+    edit_first_trial("TwoAFD", "TwoAFE")
+    df = synthetic.make_mouse_df("mouse", n_days=1, trials_per_day=5)
+    with open(csv_path, "a") as f:
+        f.write(df.to_csv(sep=";", index=False, header=False))
+    loaded = MouseDataLoader(csv_path).load()
+    assert loaded["task"].iloc[0] == "TwoAFE"
+    assert len(loaded) == 605
+
+
+def test_load_in_chunks_with_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader_module, "CHUNK_ROWS", 25)
+    df = synthetic.make_mouse_df("mouse", n_days=4, trials_per_day=30)
+    csv_path = tmp_path / "mouse.csv"
+    df.to_csv(csv_path, sep=";", index=False)
+    fractions = []
+    loaded = MouseDataLoader(csv_path, use_cache=False).load(
+        lambda done, total: fractions.append(done / total)
+    )
+    assert len(fractions) == 5
+    assert fractions == sorted(fractions) and fractions[-1] == 1
+    pd.testing.assert_frame_equal(
+        loaded, MouseDataLoader(csv_path, use_cache=False).load()
+    )
+
+    def cancel(done, total):
+        raise LoadCancelled
+
+    loader = MouseDataLoader(csv_path, use_cache=False)
+    with pytest.raises(LoadCancelled):
+        loader.load(cancel)
+    assert loader.df is None
@@ -0,0 +1,28 @@
+from behavior_data_visualizer.memo import DiskFigureCache, FigureCache
+
+
+def test_figure_cache_is_bounded_by_size():
+    cache = FigureCache(max_bytes=25)
+    cache.put(("project", "a", "2024-01-01"), ("text", "x" * 10))
+    cache.put(("project", "a", "2024-01-02"), ("text", "x" * 10))
+    assert cache.get(("project", "a", "2024-01-01")) is None
+    assert cache.get(("project", "a", "2024-01-02")) == ("text", "x" * 10)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_mouse():
+    cache = FigureCache()
+    cache.put(("project", "a", "2024-01-01"), "a")
+    cache.put(("project", "b", "2024-01-01"), "b")
+    cache.invalidate("project", "a")
+    assert cache.get(("project", "a", "2024-01-01")) is None
+    assert cache.get(("project", "b", "2024-01-01")) == "b"
+
+
+def test_disk_figure_cache_is_shared(tmp_path):
+    key = ("project", "a", "2024-01-01", 50, "100-abc")
+    DiskFigureCache(tmp_path).put(key, ("text", "{}", "{}"))
+    cache = DiskFigureCache(tmp_path)
+    assert cache.get(key) == ("text", "{}", "{}")
+    cache.invalidate("project", "a")
+    assert cache.get(key) is None
@@ -0,0 +1,53 @@
+import flask
+import pytest
+from dash.exceptions import PreventUpdate
+
+from behavior_data_visualizer import metrics
+from behavior_data_visualizer.cache import MouseDataCache
+
+
+def test_stage_and_callback_timings(capsys):
+    registry = metrics.Metrics()
+    with registry.timer("load"):
+        pass
+    with registry.timer("load"):
+        pass
+    assert registry.get_histogram("stage_seconds", stage="load")[0] == 2
+
+    @metrics.timed_callback(slow_seconds=0, metrics=registry)
+    def update_calendar(value):
+        if value is None:
+            raise PreventUpdate
+        return value
+
+    assert update_calendar(1) == 1
+    with pytest.raises(PreventUpdate):
+        update_calendar(None)
+    count, seconds = registry.get_histogram(
+        "callback_seconds", callback="update_calendar"
+    )
+    assert count == 2 and seconds >= 0
+    assert "Slow callback update_calendar" in capsys.readouterr().out
+
+
+def test_metrics_endpoint():
+    registry = metrics.Metrics()
+    with registry.timer("figure"):
+        pass
+    cache = MouseDataCache()
+    cache.get("project", "mouse")
+    metrics.register_cache_gauges("mouse_cache", cache, metrics=registry)
+    registry.register_gauge("resident_memory_bytes", lambda: 1024)
+
+    server = flask.Flask(__name__)
+    metrics.register_metrics_route(server, registry)
+    with server.test_client().get("/metrics") as response:
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        text = response.get_data(as_text=True)
+    assert "# TYPE bdv_stage_seconds histogram" in text
+    assert 'bdv_stage_seconds_bucket{le="+Inf",stage="figure"} 1' in text
+    assert 'bdv_stage_seconds_count{stage="figure"} 1' in text
+    assert "# TYPE bdv_mouse_cache_misses_total counter" in text
+    assert "bdv_mouse_cache_misses_total 1" in text
+    assert "bdv_resident_memory_bytes 1024" in text
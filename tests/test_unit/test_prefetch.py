@@ -0,0 +1,74 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from behavior_data_visualizer import synthetic
+from behavior_data_visualizer.cache import MouseDataCache
+from behavior_data_visualizer.prefetch import MousePrefetcher
+
+
+def make_load_function(calls, delay=0):
+    def load_function(project_name, mouse_name):
+        calls.append(mouse_name)
+        time.sleep(delay)
+        df = synthetic.make_mouse_df(mouse_name, n_days=1, trials_per_day=10)
+        return SimpleNamespace(df=df)
+
+    return load_function
+
+
+def test_prefetched_mice_are_cached():
+    calls = []
+    cache = MouseDataCache()
+    prefetcher = MousePrefetcher(cache, make_load_function(calls))
+    prefetcher.prefetch("project", ["a", "b", "c"])
+    for mouse_name in ["a", "b", "c"]:
+        assert prefetcher.get("project", mouse_name) is not None
+    assert sorted(calls) == ["a", "b", "c"]
+    prefetcher.shutdown()
+
+
+def test_concurrent_gets_load_once():
+    calls = []
+    cache = MouseDataCache()
+    prefetcher = MousePrefetcher(
+        cache, make_load_function(calls, delay=0.2), max_workers=0
+    )
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(prefetcher.get("project", "a"))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ["a"]
+    assert all(result is results[0] for result in results)
+
+
+def test_pages_do_not_cancel_each_other():
+    calls = []
+    release = threading.Event()
+    load_function = make_load_function(calls)
+
+    def blocking_load_function(project_name, mouse_name):
+        release.wait(5)
+        return load_function(project_name, mouse_name)
+
+    cache = MouseDataCache()
+    prefetcher = MousePrefetcher(cache, blocking_load_function, max_workers=1)
+    prefetcher.prefetch("project1", ["a", "b"], "page a")
+    prefetcher.prefetch("project2", ["c", "d"], "page b")
+    # page a selects another project, the mice page b asked for stay queued
+    prefetcher.prefetch("project3", ["e"], "page a")
+    release.set()
+    # one worker, the last prefetch is done after all the others
+    deadline = time.monotonic() + 5
+    while ("project3", "e") not in cache and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert calls == ["a", "c", "d", "e"]
+    assert ("project2", "d") in cache
+    prefetcher.shutdown()
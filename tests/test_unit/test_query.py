@@ -0,0 +1,53 @@
+import pytest
+
+from behavior_data_visualizer import synthetic, utils
+
+pytest.importorskip("pyarrow")
+from behavior_data_visualizer import query  # noqa: E402
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    data_root = tmp_path / "data"
+    synthetic.write_data_root(data_root, n_projects=2, n_mice=2, n_days=10, trials_per_day=50)
+    monkeypatch.setenv(utils.DATA_PATH_ENV, str(data_root))
+    utils.get_data_path.cache_clear()
+    yield query.TrialDataset(tmp_path / "dataset", transform=None, use_cache=False)
+    utils.get_data_path.cache_clear()
+
+
+def test_update_only_converts_changed_mice(dataset):
+    assert dataset.update() == 4
+    assert dataset.update() == 0
+    synthetic.write_mouse_csv(
+        utils.get_data_path(), "project00", "mouse000", n_days=11, trials_per_day=50
+    )
+    assert dataset.update() == 1
+    assert len(dataset.query(["trial"], projects=["project00"], mice=["mouse000"])) == 550
+
+
+def test_filters_and_aggregates(dataset):
+    dataset.update()
+    df = dataset.query(
+        ["mouse", "day", "correct"],
+        projects=["project01"],
+        start="2024-01-03",
+        end="2024-01-04",
+    )
+    assert list(df.columns) == ["mouse", "day", "correct"]
+    assert len(df) == 2 * 2 * 50
+    assert sorted(df["mouse"].unique()) == ["mouse000", "mouse001"]
+
+    all_trials = dataset.query(["project", "mouse", "stimulus_modality", "correct"])
+    expected = (
+        all_trials.groupby(["project", "stimulus_modality"])["correct"]
+        .agg(["size", "mean"])
+        .reset_index()
+    )
+    # small batches, so that the partial aggregates are combined
+    dataset.scan = lambda columns, **filters: query.TrialDataset.scan(
+        dataset, columns, batch_size=64, **filters
+    )
+    result = dataset.aggregate(["project", "stimulus_modality"])
+    assert result["trials"].tolist() == expected["size"].tolist()
+    assert result["correct"].tolist() == pytest.approx(expected["mean"].tolist())
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import flask
+
+from behavior_data_visualizer import reports
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+def render_stub(csv_path, mouse_name, kind, session, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(PNG)
+
+
+def render_error(csv_path, mouse_name, kind, session, path):
+    raise ValueError("no trials")
+
+
+def make_renderer(tmp_path, render_function):
+    store = reports.ReportStore(tmp_path)
+    executor = ThreadPoolExecutor(max_workers=1)
+    return reports.ReportRenderer(store, render_function, executor=executor)
+
+
+def test_render_and_serve(tmp_path):
+    renderer = make_renderer(tmp_path, render_stub)
+    args = ("project", "mouse", reports.SESSION_SUMMARY, "2024-01-01", "10-ab")
+    assert renderer.request(*args, "mouse.csv") is None
+    renderer._executor.shutdown(wait=True)
+    url = renderer.request(*args, "mouse.csv")
+    assert url == "/reports/project/mouse/session_summary_2024-01-01_10-ab.png"
+
+    server = flask.Flask(__name__)
+    reports.register_report_route(server, renderer.store)
+    client = server.test_client()
+    with client.get(url) as response:
+        assert response.status_code == 200
+        assert response.data == PNG
+    with client.get("/reports/project/mouse/missing.png") as response:
+        assert response.status_code == 404
+    with client.get("/reports/../mouse/x.png") as response:
+        assert response.status_code == 404
+
+
+def test_render_error(tmp_path):
+    renderer = make_renderer(tmp_path, render_error)
+    args = ("project", "mouse", reports.SUBJECT_PROGRESS, "all", "10-ab")
+    renderer.request(*args, "mouse.csv")
+    renderer._executor.shutdown(wait=True)
+    assert isinstance(renderer.get_error(*args), ValueError)
+    # failed reports are not rendered again
+    assert renderer.request(*args, "mouse.csv") is None
+    assert renderer.n_pending() == 0
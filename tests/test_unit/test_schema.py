@@ -0,0 +1,66 @@
+import pandas as pd
+
+from behavior_data_visualizer import schema, synthetic
+from behavior_data_visualizer.loader import MouseDataLoader
+
+
+def test_compact_dtypes_reduce_memory():
+    df = synthetic.make_mouse_df("mouse", n_days=5, trials_per_day=200)
+    compact = schema.compact_dtypes(df.copy())
+    assert isinstance(compact["subject"].dtype, pd.CategoricalDtype)
+    assert compact["trial"].dtype == "int16"
+    assert compact["TRIAL_START"].dtype == "float64"
+    assert compact["leftward_evidence"].dtype == "float32"
+    original_size = df.memory_usage(deep=True).sum()
+    assert compact.memory_usage(deep=True).sum() < original_size / 3
+
+
+def test_concat_frames_keeps_categoricals():
+    df = pd.DataFrame({"a": pd.Categorical(["x", "x"])})
+    tail = pd.DataFrame({"a": pd.Categorical(["y"])})
+    result = schema.concat_frames(df, tail)
+    assert isinstance(result["a"].dtype, pd.CategoricalDtype)
+    assert result["a"].tolist() == ["x", "x", "y"]
+    assert df["a"].cat.categories.tolist() == ["x"]
+
+
+def test_refresh_with_an_empty_string_column(tmp_path):
+    # the appended trials have no stage, pandas parses the column as floats
+    df = synthetic.make_mouse_df("mouse", n_days=2, trials_per_day=20)
+    df.loc[30:, "current_training_stage"] = None
+    csv_path = tmp_path / "mouse.csv"
+    df.iloc[:30].to_csv(csv_path, sep=";", index=False)
+    loader = MouseDataLoader(csv_path, use_cache=False)
+    loader.load()
+    assert isinstance(loader.df["current_training_stage"].dtype, pd.CategoricalDtype)
+    with open(csv_path, "a") as f:
+        f.write(df.iloc[30:].to_csv(sep=";", index=False, header=False))
+    assert loader.refresh() == 10
+    stages = loader.df["current_training_stage"]
+    assert isinstance(stages.dtype, pd.CategoricalDtype)
+    assert stages.iloc[:30].tolist() == ["TwoAFC_visual_hard"] * 30
+    assert stages.iloc[30:].isna().all()
+
+
+def test_refresh_with_a_trailing_separator(tmp_path):
+    df = synthetic.make_mouse_df("mouse", n_days=2, trials_per_day=20)
+    csv_path = tmp_path / "mouse.csv"
+
+    def write(rows, mode, header):
+        lines = rows.to_csv(sep=";", index=False, header=header).splitlines()
+        with open(csv_path, mode) as f:
+            f.write("".join(f"{line};\n" for line in lines))
+
+    write(df.iloc[:30], "w", True)
+    loaders = [
+        MouseDataLoader(csv_path, use_cache=False, compact=compact)
+        for compact in [True, False]
+    ]
+    for loader in loaders:
+        loader.load()
+    write(df.iloc[30:], "a", False)
+    for loader in loaders:
+        assert loader.refresh() == 10
+        loaded = MouseDataLoader(csv_path, use_cache=False, compact=loader.compact)
+        assert loader.df.columns.tolist() == loaded.load().columns.tolist()
+    assert loaders[0].df.columns.tolist() == df.columns.tolist()
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from behavior_data_visualizer import synthetic
+from behavior_data_visualizer.catalog import DataCatalog
+
+
+def test_data_root_with_videos(tmp_path):
+    paths = synthetic.write_data_root(
+        tmp_path,
+        n_projects=2,
+        n_mice=2,
+        n_days=3,
+        trials_per_day=10,
+        sessions_per_day=2,
+        videos=True,
+        video_bytes=100,
+    )
+    assert len(paths) == 4
+    df = pd.read_csv(paths[0], sep=";")
+    assert df["session"].nunique() == 6
+
+    catalog = DataCatalog(tmp_path)
+    catalog.refresh()
+    assert catalog.get_projects() == ["project00", "project01"]
+    assert catalog.get_mice("project00") == ["mouse000", "mouse001"]
+    video_name = synthetic.get_video_name("mouse000", "TwoAFC", df["date"].iloc[0])
+    assert video_name == "mouse000_TwoAFC_20240101_090000.mp4"
+    assert catalog.has_video("project00", "mouse000", video_name)
+    video_path = tmp_path / "project00" / "videos" / "mouse000" / video_name
+    assert video_path.stat().st_size == 100
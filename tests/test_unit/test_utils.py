@@ -0,0 +1,60 @@
+import json
+import subprocess
+import sys
+
+from behavior_data_visualizer import synthetic, utils
+
+
+def test_data_path_from_env_and_config(tmp_path, monkeypatch):
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"data_path": "/config/root"}))
+    monkeypatch.setenv(utils.CONFIG_PATH_ENV, str(config_path))
+    monkeypatch.delenv(utils.DATA_PATH_ENV, raising=False)
+    utils.get_data_path.cache_clear()
+    assert utils.get_data_path() == "/config/root/"
+
+    # the environment, and so the --data_path option, go before the config
+    monkeypatch.setenv(utils.DATA_PATH_ENV, str(tmp_path))
+    utils.get_data_path.cache_clear()
+    assert utils.get_data_path() == f"{tmp_path}/"
+    utils.set_data_path("/option/root/")
+    assert utils.get_data_path() == "/option/root/"
+    utils.get_data_path.cache_clear()
+
+
+def test_lazy_imports():
+    code = (
+        "import sys, behavior_data_visualizer.utils;"
+        "print(any(m.startswith(('plotly', 'matplotlib', 'lecilab')) for m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert output.stdout.strip() == "False"
+
+
+def test_app_imports_the_dataset_on_the_first_query():
+    code = (
+        "import sys, behavior_data_visualizer.main;"
+        "print('pyarrow.dataset' in sys.modules)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert output.stdout.strip() == "False"
+
+
+def test_session_and_date_dictionaries():
+    df = synthetic.make_mouse_df(
+        "mouse", n_days=4, trials_per_day=20, sessions_per_day=2
+    )
+    df["year_month_day"] = df["date"].str[:10]
+    # as the loop over the sessions built them
+    expected = {}
+    for session in df["session"].unique():
+        date = df[df["session"] == session]["date"].unique()[0]
+        expected[str(date) + " - Session: " + str(session)] = session
+    assert utils.get_dicctionary_of_sessions(df) == expected
+    assert list(utils.get_dicctionary_of_sessions(df)) == list(expected)
+    dates = utils.get_diccionary_of_dates(df)
+    assert list(dates) == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
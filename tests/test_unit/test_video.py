@@ -0,0 +1,60 @@
+import flask
+
+from behavior_data_visualizer import utils, video
+
+
+def make_client(tmp_path):
+    video_path = tmp_path / "mouse_task_20240101_100000.mp4"
+    video_path.write_bytes(bytes(range(256)) * 1000)
+    index = video.VideoIndex(
+        lambda project, subject, task, date: str(video_path)
+    )
+    server = flask.Flask(__name__)
+    video.register_video_route(server, index)
+    url = video.get_video_url("project", "mouse", "task", "2024-01-01 10:00:00")
+    return server.test_client(), url
+
+
+def test_range_request(tmp_path):
+    client, url = make_client(tmp_path)
+    with client.get(url, headers={"Range": "bytes=1000-1009"}) as response:
+        assert response.status_code == 206
+        assert response.data == bytes(range(232, 242))
+        assert response.headers["Content-Range"] == "bytes 1000-1009/256000"
+
+
+def test_conditional_request(tmp_path):
+    client, url = make_client(tmp_path)
+    with client.get(url) as response:
+        etag = response.headers["ETag"]
+    with client.get(url, headers={"If-None-Match": etag}) as response:
+        assert response.status_code == 304
+
+
+def test_missing_video(tmp_path):
+    server = flask.Flask(__name__)
+    video.register_video_route(server, video.VideoIndex(lambda *args: None))
+    url = video.get_video_url("project", "mouse", "task", "2024-01-01")
+    assert server.test_client().get(url).status_code == 404
+
+
+def test_paths_outside_the_data_root(tmp_path, monkeypatch):
+    # where <root>/../videos/../.._t_d.mp4 leads
+    (tmp_path / ".._t_d.mp4").write_bytes(b"secret")
+    data_root = tmp_path / "data"
+    data_root.mkdir()
+    monkeypatch.setenv(utils.DATA_PATH_ENV, str(data_root))
+    utils.get_data_path.cache_clear()
+    try:
+        assert utils.get_video_path("..", "..", "t", "d") is None
+        assert utils.get_video_path("project", "mouse", "task", "2024-01-01").startswith(
+            str(data_root)
+        )
+        server = flask.Flask(__name__)
+        index = video.VideoIndex(utils.get_video_path)
+        video.register_video_route(server, index)
+        client = server.test_client()
+        assert client.get("/video/%2E%2E/%2E%2E/t/d").status_code == 404
+        assert client.get("/video/p/..%2F..%2Fm/t/d").status_code == 404
+    finally:
+        utils.get_data_path.cache_clear()